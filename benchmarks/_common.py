@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Shared helpers for the CSS-HTML-Prettify benchmarks."""
+
+
+import importlib.util
+import os
+import sys
+
+from timeit import repeat
+from types import SimpleNamespace
+
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), "css-html-prettify.py")
+PROPS = ("color", "margin", "padding", "border", "background-color",
+         "-webkit-transform", "transform", "z-index", "display", "width",
+         "height", "font-size", "-moz-box-sizing", "box-sizing", "opacity",
+         "line-height", "transition", "margin-top", "unknown-property")
+VALUES = ("0px", "0 0 0 0", "#FFF", "none", "0em auto", "10px 0px", "red",
+          "1.5", "url(image.png)", "0%", "calc(100% - 0px)")
+
+
+def load_prettifier(**options):
+    """Import css-html-prettify.py as a module, with default CLI options."""
+    spec = importlib.util.spec_from_file_location("css_html_prettify", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # So the pool can pickle its functions.
+    spec.loader.exec_module(module)
+    defaults = dict(group=False, justify=False, extraline=False, prefix=None,
+                    timestamp=False, quiet=True, watch=False, indent_width=4,
+                    beautifulsoup=False, stats=False, stats_json=None,
+                    check=False, fail_fast=False)
+    defaults.update(options)
+    module.args = SimpleNamespace(**defaults)
+    return module
+
+
+def best_of(function, *arguments, number: int=1, repeats: int=3) -> float:
+    """Return the best wall time in seconds of function(*arguments)."""
+    return min(repeat(lambda: function(*arguments),
+                      number=number, repeat=repeats)) / number
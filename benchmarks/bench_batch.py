@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark a build tool plugin prettifying many documents.
+
+Writing a temporary file and running the script on it for each document,
+piping each document through a run with -, and piping all of them
+through one run with --batch.
+"""
+
+
+import json
+import os
+import subprocess
+import sys
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from _common import SCRIPT
+from corpus import make_css
+
+
+def temp_files(documents: list) -> list:
+    """Return the outputs of one run on a temporary file by document."""
+    outputs = []
+    with TemporaryDirectory() as folder:
+        for number, document in enumerate(documents):
+            css_path = os.path.join(folder, f"{number}.css")
+            with open(css_path, "w", encoding="utf-8") as css_file:
+                css_file.write(document)
+            subprocess.run([sys.executable, SCRIPT, "--quiet", "--no-cache",
+                            css_path], check=True)
+            with open(css_path, encoding="utf-8") as css_file:
+                outputs.append(css_file.read())
+    return outputs
+
+
+def pipes(documents: list) -> list:
+    """Return the outputs of one run with - by document."""
+    return [subprocess.run([sys.executable, SCRIPT, "--quiet", "-"],
+                           input=document, capture_output=True, text=True,
+                           check=True).stdout for document in documents]
+
+
+def batch(documents: list) -> list:
+    """Return the outputs of one run with --batch for all documents."""
+    requests = "".join(json.dumps({"content": document, "id": number}) +
+                       "\n" for number, document in enumerate(documents))
+    responses = subprocess.run(
+        [sys.executable, SCRIPT, "--quiet", "--batch"], input=requests,
+        capture_output=True, text=True, check=True).stdout.splitlines()
+    return [json.loads(response)["output"] for response in responses]
+
+
+def main():
+    """Print the time of each way, checking that their outputs match."""
+    documents = [make_css(2_000, seed=seed) for seed in range(100)]
+    expected = None
+    print(f"{'way':>12} {'time (s)':>9} {'docs/s':>8}")
+    for way in (temp_files, pipes, batch):
+        started = perf_counter()
+        outputs = way(documents)
+        seconds = perf_counter() - started
+        expected = expected or outputs
+        assert outputs == expected, f"{way.__name__} output differs"
+        print(f"{way.__name__:>12} {seconds:>9.2f} "
+              f"{len(documents) / seconds:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark the cold start, a whole run on a tiny CSS file.
+
+Times an empty Python as the floor, the script, and the zipapp that
+python3 setup.py zipapp builds, with its bytecode precompiled.
+"""
+
+
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from zipapp import create_archive
+
+from _common import SCRIPT
+
+
+def make_zipapp(folder: str) -> str:
+    """Build the zipapp like setup.py does on folder, return its path."""
+    main = os.path.join(folder, "app", "__main__.py")
+    os.makedirs(os.path.dirname(main))
+    shutil.copy(SCRIPT, main)
+    py_compile.compile(main, main + "c", doraise=True, invalidation_mode=(
+        py_compile.PycInvalidationMode.UNCHECKED_HASH))
+    target = os.path.join(folder, "css-html-prettify.pyz")
+    create_archive(os.path.dirname(main), target)
+    return target
+
+
+def cold_start(command: list, repeats: int=20) -> float:
+    """Return the best wall time in seconds of running command."""
+    times = []
+    for _ in range(repeats):
+        started = perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(perf_counter() - started)
+    return min(times)
+
+
+def main():
+    """Print the best cold start of each command."""
+    with TemporaryDirectory() as folder:
+        css_path = os.path.join(folder, "tiny.css")
+        with open(css_path, "w", encoding="utf-8") as css_file:
+            css_file.write("a{color:red;margin:0px}\n")
+        pyz = make_zipapp(folder)
+        commands = {
+            "python -c pass": [sys.executable, "-c", "pass"],
+            "--version script": [sys.executable, SCRIPT, "--version"],
+            "--version zipapp": [sys.executable, pyz, "--version"],
+            "tiny.css script": [sys.executable, SCRIPT, "--quiet",
+                                "--no-cache", css_path],
+            "tiny.css zipapp": [sys.executable, pyz, "--quiet", "--no-cache",
+                                css_path],
+            "tiny.css cached zipapp": [sys.executable, pyz, "--quiet",
+                                       "--cache-file",
+                                       os.path.join(folder, "cache"),
+                                       css_path],
+        }
+        print(f"{'command':>24} {'best (ms)':>10}")
+        for name, command in commands.items():
+            print(f"{name:>24} {cold_start(command) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark a one line edit re-prettified whole vs with IncrementalCSS."""
+
+
+from contextlib import redirect_stdout
+from io import StringIO
+from time import perf_counter
+
+from _common import load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+
+
+def edit(css: str, number: int) -> str:
+    """Return css with a new property added on the middle rule."""
+    middle = css.index("{\n", len(css) // 2) + 2
+    return f"{css[:middle]}    margin-top: {number}px;\n{css[middle:]}"
+
+
+def main():
+    """Print the latency of an editor save, whole file vs incremental."""
+    print(f"{'file (KB)':>10} {'whole (s)':>10} {'first (s)':>10} "
+          f"{'save (s)':>9} {'speedup':>8}")
+    for size in (100, 1_000, 10_000):
+        css = make_css(size * 1024)
+        incremental = prettifier.IncrementalCSS()
+        with redirect_stdout(StringIO()):
+            started = perf_counter()
+            prettifier.css_prettify(css)
+            whole = perf_counter() - started
+            started = perf_counter()
+            incremental.prettify(css)
+            first = perf_counter() - started
+            saves = []
+            for number in range(3):  # Output goes to a --prefix file.
+                css = edit(css, number)
+                started = perf_counter()
+                pretty_css = incremental.prettify(css)
+                saves.append(perf_counter() - started)
+            assert pretty_css == prettifier.css_prettify(css)
+        save = min(saves)
+        print(f"{size:>10} {whole:>10.3f} {first:>10.3f} {save:>9.3f} "
+              f"{whole / save:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark css_prettify vs css_prettify_parallel on big stylesheets."""
+
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+from multiprocessing import cpu_count, Pool
+
+from _common import best_of, load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+
+
+def main():
+    """Print serial and parallel times, and check they give the same."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=cpu_count())
+    parser.add_argument("--sizes", type=int, nargs="+", help="Sizes in MB.",
+                        default=(4, 16, 32))
+    parser.add_argument("--shard-size", type=int,
+                        default=prettifier.CSS_SHARD_SIZE)
+    options = parser.parse_args()
+    print(f"{options.jobs} jobs.\n{'input (MB)':>10} {'serial (s)':>11} "
+          f"{'parallel (s)':>13} {'speedup':>8}")
+    with Pool(options.jobs) as pool:
+        for size in options.sizes:
+            css = make_css(size * 1024 * 1024)
+            with redirect_stdout(StringIO()):
+                serial = best_of(prettifier.css_prettify, css, True,
+                                 repeats=1)
+                parallel = best_of(
+                    prettifier.css_prettify_parallel, css, True, False,
+                    False, pool, options.shard_size, repeats=1)
+                assert prettifier.css_prettify(css, True) == (
+                    prettifier.css_prettify_parallel(
+                        css, True, pool=pool, shard_size=options.shard_size))
+            print(f"{size:>10} {serial:>11.2f} {parallel:>13.2f} "
+                  f"{serial / parallel:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark css_prettify throughput (MB/s) and peak memory by input size."""
+
+
+import tracemalloc
+
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _common import best_of, load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+
+
+def main():
+    """Print MB/s and tracemalloc peak, both should scale linearly."""
+    print(f"{'input (MB)':>10} {'time (s)':>10} {'MB/s':>8} "
+          f"{'peak (MB)':>10} {'peak/input':>10}")
+    for size in (30_000, 300_000, 3_000_000, 12_000_000):
+        css = make_css(size)
+        megabytes = len(css.encode("utf-8")) / 1024 / 1024
+        with redirect_stdout(StringIO()):
+            seconds = best_of(prettifier.css_prettify, css, repeats=2)
+            tracemalloc.start()
+            prettifier.css_prettify(css)
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+        print(f"{megabytes:>10.2f} {seconds:>10.3f} "
+              f"{megabytes / seconds:>8.2f} {peak:>10.1f} "
+              f"{peak / megabytes:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
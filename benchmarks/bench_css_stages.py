@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark each css_prettify stage independently by input size.
+
+Every stage is timed on the real output of the previous stage, so the
+numbers add up to one css_prettify(justify=True) run.
+"""
+
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _common import best_of, load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+STAGES = ("sort_properties", "condense_zero_units", "wrap_css_lines",
+          "split_long_selectors", "condense_semicolons",
+          "normalize_whitespace", "justify_right", "add_encoding",
+          "simple_replace")
+
+
+def bench_stages(css: str, repeats: int) -> list:
+    """Return [(stage, seconds, MB/s)] for all stages over css."""
+    megabytes, results = len(css.encode("utf-8")) / 1024 / 1024, []
+    for stage in STAGES:
+        function = getattr(prettifier, stage)
+        with redirect_stdout(StringIO()):
+            seconds = best_of(function, css, repeats=repeats)
+            css = function(css)
+        results.append((stage, seconds, megabytes / seconds))
+    return results
+
+
+def main():
+    """Print a per-stage timing table for every requested input size."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", help="Sizes in KB.",
+                        default=(10, 1024, 20 * 1024))
+    parser.add_argument("--repeats", type=int, default=3)
+    options = parser.parse_args()
+    for size in options.sizes:
+        print(f"\n{size} KB input:\n{'stage':>22} {'time (s)':>10} "
+              f"{'MB/s':>10}")
+        css = make_css(size * 1024)
+        for stage, seconds, throughput in bench_stages(css, options.repeats):
+            print(f"{stage:>22} {seconds:>10.4f} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark peak memory of whole-file vs --stream CSS processing.
+
+Uses tracemalloc, peak of the whole-file path grows with the file size,
+peak of the streaming path should stay about the same for any file size.
+The files in one @media block have no cut, so their stream peak grows,
+but their time must stay linear with the file size.
+"""
+
+
+import itertools
+import os
+import tracemalloc
+
+from contextlib import redirect_stdout
+from io import StringIO
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from _common import load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier(prefix="pretty_")
+
+
+def traced(function, *arguments) -> tuple:
+    """Return (seconds, peak MB) of one function(*arguments) call."""
+    tracemalloc.start()
+    started = perf_counter()
+    with redirect_stdout(StringIO()):
+        function(*arguments)
+    seconds = perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    """Print a whole-file vs stream peak memory table by file size."""
+    print(f"{'file (MB)':>11} {'whole (s)':>10} {'whole peak':>11} "
+          f"{'stream (s)':>11} {'stream peak':>12}")
+    with TemporaryDirectory() as folder:
+        for size, media in itertools.product((1, 4, 16), (False, True)):
+            css = make_css(size * 1024 * 1024)
+            if media:
+                css = "@media screen {\n  " + css.replace("\n", "\n  ") + "}\n"
+            css_file_path = os.path.join(folder, f"{size}.css")
+            with open(css_file_path, "w", encoding="utf-8") as css_file:
+                css_file.write(css)
+            prettifier.args.stream = False
+            whole = traced(prettifier.process_single_css_file, css_file_path)
+            prettifier.args.stream = True
+            stream = traced(prettifier.process_single_css_file, css_file_path)
+            print(f"{size:>10}{'@' if media else ' '} {whole[0]:>10.2f} "
+                  f"{whole[1]:>9.1f}MB {stream[0]:>11.2f} "
+                  f"{stream[1]:>10.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
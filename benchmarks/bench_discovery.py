@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark the folder discovery, os.walk listing against scan_files.
+
+The folder has a corpus, a node_modules tree and minified files, like a
+web project, the old listing takes them all, scan_files skips them and
+yields the first file to process right away.
+"""
+
+
+import os
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from _common import best_of, load_prettifier
+from corpus import make_css, write_corpus
+
+
+TARGET = (".css", ".scss", ".html", ".htm")
+prettifier = load_prettifier()
+
+
+def make_project(folder: str, files: int=100, modules: int=5000):
+    """Write a corpus, a node_modules tree and minified files to folder."""
+    write_corpus(folder, files, files, 2_000, 2_000)
+    css = make_css(2_000)
+    for number in range(modules):
+        module = os.path.join(folder, "node_modules", f"module-{number % 50}",
+                              "dist")
+        os.makedirs(module, exist_ok=True)
+        with open(os.path.join(module, f"{number}.css"), "w",
+                  encoding="utf-8") as css_file:
+            css_file.write(css)
+    minified = css.replace("\n", "")
+    for number in range(files // 10):
+        with open(os.path.join(folder, "css", f"bundle-{number}.css"),
+                  "w", encoding="utf-8") as css_file:
+            css_file.write(minified)
+
+
+def walk_list(folder: str) -> list:
+    """Return the files like the os.walk listing before scan_files did."""
+    return [os.path.abspath(os.path.join(root, name))
+            for root, _, names in os.walk(folder) for name in names
+            if not name.startswith(".") and not name.endswith(".min.css") and
+            name.endswith(TARGET)]
+
+
+def first_file(folder: str) -> float:
+    """Return the seconds until scan_files yields the first file."""
+    started = perf_counter()
+    next(prettifier.scan_files(folder, TARGET, ".min.css"))
+    return perf_counter() - started
+
+
+def main():
+    """Print the files found and the time of both listings."""
+    with TemporaryDirectory() as folder:
+        make_project(folder)
+        scanned = list(prettifier.scan_files(folder, TARGET, ".min.css"))
+        print(f"{'listing':>12} {'files':>7} {'time (ms)':>10} "
+              f"{'first (ms)':>11}")
+        walk_time = best_of(walk_list, folder)
+        print(f"{'os.walk':>12} {len(walk_list(folder)):>7} "
+              f"{walk_time * 1000:>10.1f} {walk_time * 1000:>11.1f}")
+        scan_time = best_of(lambda: list(prettifier.scan_files(
+            folder, TARGET, ".min.css")))
+        print(f"{'scan_files':>12} {len(scanned):>7} "
+              f"{scan_time * 1000:>10.1f} "
+              f"{min(first_file(folder) for _ in range(3)) * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark the native html_prettify against the BeautifulSoup4 one."""
+
+
+import random
+import warnings
+
+from contextlib import redirect_stdout
+from io import StringIO
+
+from _common import best_of, load_prettifier
+
+
+prettifier = load_prettifier()
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "&amp;", "consectetur")
+
+
+def make_html(rows: int, seed: int=42) -> str:
+    """Return a synthetic server rendered page with about that many rows."""
+    rand, body = random.Random(seed), []
+    for row in range(rows):
+        words = " ".join(rand.choice(WORDS) for _ in range(rand.randint(3, 9)))
+        body.append(
+            f'<tr class="row-{row}" data-id="{row}"><td><a href="/item?id='
+            f'{row}&amp;page=1">{words}</a></td><td><input type="checkbox" '
+            f'name="item-{row}"><br><b>{row}</b> items</td></tr>\n')
+        if not row % 500:
+            body.append(f"<pre>  preformatted {row}\n    text</pre>\n"
+                        f"<script>if (a < b) {{ row = {row}; }}</script>\n")
+    return ("<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>Page"
+            "</title><style>td { color: red }</style></head><body><table>\n"
+            f"{''.join(body)}</table></body></html>\n")
+
+
+def main():
+    """Print seconds and MB/s of both engines, by page size."""
+    print(f"{'page (MB)':>10} {'bs4 (s)':>9} {'native (s)':>11} "
+          f"{'native MB/s':>12} {'speedup':>8}")
+    warnings.simplefilter("ignore")  # BS4 GuessedAtParserWarning.
+    for rows in (1_000, 4_000, 10_000):
+        html = make_html(rows)
+        megabytes = len(html.encode("utf-8")) / 1024 / 1024
+        with redirect_stdout(StringIO()):
+            soup = best_of(prettifier.html_prettify_soup, html, repeats=2)
+            native = best_of(prettifier.html_prettify, html, repeats=2)
+        print(f"{megabytes:>10.2f} {soup:>9.3f} {native:>11.3f} "
+              f"{megabytes / native:>12.2f} {soup / native:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
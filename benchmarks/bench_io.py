@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark file I/O of the processors on a tree of 5k CSS files.
+
+Compares the text mode open().read() / write() path against the
+read_text_file() / write_text_file() fast path (mmap for big files).
+"""
+
+
+import os
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from _common import load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+
+
+def text_mode_read(file_path: str) -> str:
+    """Old read path."""
+    with open(file_path, encoding="utf-8-sig") as text_file:
+        return text_file.read()
+
+
+def text_mode_write(file_path: str, text: str):
+    """Old write path."""
+    with open(file_path, "w", encoding="utf-8") as text_file:
+        text_file.write(text)
+
+
+def make_tree(folder: str, files: int) -> list:
+    """Write a tree of CSS files, mostly small, 1% of them of 1 MB."""
+    file_paths, contents = [], {size: make_css(size)
+                                for size in (2048, 16384, 1024 * 1024)}
+    for number in range(files):
+        subfolder = os.path.join(folder, str(number // 100))
+        os.makedirs(subfolder, exist_ok=True)
+        size = 1024 * 1024 if number % 100 == 0 else (
+            16384 if number % 4 == 0 else 2048)
+        file_path = os.path.join(subfolder, f"{number}.css")
+        text_mode_write(file_path, contents[size])
+        file_paths.append(file_path)
+    return file_paths
+
+
+def timed(function, file_paths: list, *arguments) -> float:
+    """Return the best of 3 seconds to run function over all files."""
+    times = []
+    for _ in range(3):
+        started = perf_counter()
+        for file_path in file_paths:
+            function(file_path, *arguments)
+        times.append(perf_counter() - started)
+    return min(times)
+
+
+def main():
+    """Print read and write times of both paths over the tree."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=5000)
+    options = parser.parse_args()
+    with TemporaryDirectory() as folder:
+        file_paths = make_tree(folder, options.files)
+        megabytes = sum(map(os.path.getsize, file_paths)) / 1024 / 1024
+        text = text_mode_read(file_paths[1])
+        print(f"{options.files} files, {megabytes:.1f} MB.\n"
+              f"{'path':>16} {'read (s)':>10} {'write (s)':>10}")
+        for name, read, write in (
+                ("text mode", text_mode_read, text_mode_write),
+                ("fast path", prettifier.read_text_file,
+                 prettifier.write_text_file)):
+            print(f"{name:>16} {timed(read, file_paths):>10.3f} "
+                  f"{timed(write, file_paths, text):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark sort_properties, linear property scan vs precompiled index."""
+
+
+from _common import best_of, load_prettifier
+from corpus import make_css
+
+
+prettifier = load_prettifier()
+
+
+def _legacy_prioritify(line_of_css: str, css_props_text_as_list: tuple):
+    """Old linear scan, rebuilt list and .index() per declaration."""
+    sorted_css_properties, groups_by_alphabetic_order = css_props_text_as_list
+    priority_integer, group_integer = 9999, 0
+    for css_property in sorted_css_properties:
+        if css_property.lower() == line_of_css.split(":")[0].lower().strip():
+            priority_integer = sorted_css_properties.index(css_property)
+            group_integer = groups_by_alphabetic_order[priority_integer]
+            break
+    return (priority_integer, group_integer)
+
+
+def legacy_sort_properties(css: str) -> str:
+    """Old sort_properties, compiles the property list on every call."""
+    css_pgs = prettifier._compile_props(prettifier.CSS_PROPS_TEXT)
+    original = prettifier._prioritify
+    prettifier._prioritify = lambda prop, grouped: _legacy_prioritify(
+        prop, css_pgs)
+    try:
+        return prettifier.sort_properties(css)
+    finally:
+        prettifier._prioritify = original
+
+
+def main():
+    """Compare the old and new sort times across stylesheet sizes."""
+    print(f"{'input (KB)':>12} {'legacy (s)':>12} {'index (s)':>12} "
+          f"{'speedup':>8}")
+    for size in (3, 30, 300, 1_200):
+        css = make_css(size * 1024)
+        assert legacy_sort_properties(css) == prettifier.sort_properties(css)
+        legacy = best_of(legacy_sort_properties, css, repeats=1)
+        indexed = best_of(prettifier.sort_properties, css)
+        print(f"{size:>12} {legacy:>12.4f} {indexed:>12.4f} "
+              f"{legacy / indexed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Synthetic corpus generator for the CSS-HTML-Prettify benchmarks.
+
+CSS of a given size, rule count and vendor prefix density, and HTML of a
+given size and nesting depth, always the same for the same seed.
+"""
+
+
+import os
+import random
+
+from argparse import ArgumentParser
+
+from _common import PROPS, VALUES
+
+
+VENDOR_PREFIXES = ("-webkit-", "-moz-", "-ms-", "-o-")
+SELECTORS = (".card", "#main", "a:hover", "ul > li", "input[type=text]",
+             ".nav .item", "h1", "p::first-line", "*", ".btn-primary")
+TAGS = ("div", "section", "article", "ul", "li", "span", "p", "nav", "table")
+WORDS = ("lorem", "ipsum", "dolor", "sit", "amet", "&amp;", "&#169;",
+         "consectetur", "adipiscing", "elit")
+
+
+def _selector(rand: random.Random, number: int) -> str:
+    """Return a selector, sometimes a list long enough to be split."""
+    selectors = [f"{rand.choice(SELECTORS)}.rule-{number}"
+                 for _ in range(rand.choice((1, 1, 1, 2, 3, 12)))]
+    return ", ".join(selectors)
+
+
+def make_css(size: int, rules: int=None, prefix_density: float=0.2,
+             seed: int=42) -> str:
+    """Return a stylesheet of about size characters.
+
+    rules is the number of rules to spread the size on, by default one
+    every ~250 characters, prefix_density is the fraction of vendor
+    prefixed properties. Some rules go inside @media blocks.
+    """
+    rand, css = random.Random(seed), ["@import url(base.css);\n\n"]
+    rules = rules or max(size // 250, 1)
+    rule_size = max(size // rules, 20)
+    for number in range(rules):
+        props = []
+        while sum(map(len, props)) < rule_size - 40 or not props:
+            prop = rand.choice(PROPS)
+            if rand.random() < prefix_density:
+                prop = rand.choice(VENDOR_PREFIXES) + prop.lstrip("-")
+            props.append(f"    {prop}: {rand.choice(VALUES)};\n")
+        rule = f"{_selector(rand, number)} {{\n{''.join(props)}}}\n\n"
+        if rand.random() < 0.05:
+            rule = f"@media (max-width: {number}px) {{\n{rule}}}\n\n"
+        css.append(rule)
+    return "".join(css)
+
+
+def make_html(size: int, depth: int=8, seed: int=42) -> str:
+    """Return a page of about size characters, nested up to depth tags.
+
+    Has attributes, inline style blocks and attributes, void elements,
+    and pre, textarea and script blocks that must be kept verbatim.
+    """
+    rand, body, length = random.Random(seed), [], 0
+    while length < size:
+        levels = rand.randint(1, max(depth, 1))
+        tags = [rand.choice(TAGS) for _ in range(levels)]
+        words = " ".join(rand.choice(WORDS) for _ in range(rand.randint(
+            2, 12)))
+        item = "".join(
+            f'<{tag} class="{tag}-{number}" '
+            f'style="margin:0px;color:red">' if number % 3 == 0 else
+            f'<{tag} id="{tag}-{length}-{number}">'
+            for number, tag in enumerate(tags))
+        item += f"{words}<br><img src=a.png alt=''><input type=checkbox>"
+        item += "".join(f"</{tag}>" for tag in reversed(tags)) + "\n"
+        if rand.random() < 0.05:
+            item += ("<pre>  keep   this\n    as is</pre>\n"
+                     "<textarea>  raw <b>text</b></textarea>\n"
+                     f"<script>if (a < b) {{ x = {length}; }}</script>\n"
+                     f"<style>.s-{length}{{padding:0px;color:red}}</style>\n")
+        body.append(item)
+        length += len(item)
+    return ("<!DOCTYPE html>\n<html><head><meta charset='utf-8'>"
+            "<title>Corpus</title><style>\nbody { margin: 0px; }\n</style>"
+            f"</head><body>\n{''.join(body)}</body></html>\n")
+
+
+def write_corpus(folder: str, css_files: int=50, html_files: int=50,
+                 css_size: int=20_000, html_size: int=20_000,
+                 depth: int=8, prefix_density: float=0.2,
+                 seed: int=42) -> list:
+    """Write a corpus of CSS and HTML files to folder, return their paths."""
+    file_paths = []
+    for number in range(css_files):
+        file_paths.append(os.path.join(folder, f"css/{number}.css"))
+        text = make_css(css_size, prefix_density=prefix_density,
+                        seed=seed + number)
+        _write(file_paths[-1], text)
+    for number in range(html_files):
+        file_paths.append(os.path.join(folder, f"html/{number}.html"))
+        _write(file_paths[-1], make_html(html_size, depth, seed + number))
+    return file_paths
+
+
+def _write(file_path: str, text: str):
+    """Write a text file, making its folder if needed."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w", encoding="utf-8") as text_file:
+        text_file.write(text)
+
+
+def main():
+    """Write a corpus folder from the command line."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("folder", help="Folder to write the corpus to.")
+    parser.add_argument("--css-files", type=int, default=50)
+    parser.add_argument("--html-files", type=int, default=50)
+    parser.add_argument("--css-size", type=int, default=20_000)
+    parser.add_argument("--html-size", type=int, default=20_000)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--prefix-density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    options = parser.parse_args()
+    file_paths = write_corpus(
+        options.folder, options.css_files, options.html_files,
+        options.css_size, options.html_size, options.depth,
+        options.prefix_density, options.seed)
+    print(f"Wrote {len(file_paths)} files to {options.folder}.")
+
+
+if __name__ == "__main__":
+    main()
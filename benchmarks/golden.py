@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Golden output checks, to prove that faster engines are byte-identical.
+
+Prettifies a fixed corpus with every combination of options, compares
+the SHA-256 of each output with golden.json, and checks that the stream,
+parallel and incremental CSS engines give the same output as css_prettify.
+Run with --update only when an output change is intended.
+"""
+
+
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+from _common import load_prettifier
+from corpus import make_css, make_html
+
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "golden.json")
+CSS_EDGE_CASES = ("", "\n", "a{}", "@charset 'utf-8';\na { color: red }",
+                  "a{margin:0px;;color:red}", ".a{b:c}\n.d{e:f}",
+                  "a {\n\tz-index: 1;\n\tcolor: red;\n}\n\n\n\n\n\n\n#b{}",
+                  "a{color:red", "}}{{", "/* only a comment */")
+HTML_EDGE_CASES = (
+    "<html><head><style>\nbody {\n    margin: 0px;\n    color: red;\n}\n"
+    "</style></head></html>",
+    "<div><section><p><style>\n\t\t.a { color: red }\n\t</style></p>"
+    "</section></div>",
+    "<ul><li><style>a{z-index:1;color:red}</style></li></ul>",
+    "<DIV><STYLE>a{color:red}</STYLE><PRE>x <B>y</B></Pre ></DIV>",
+    "<svg><text><![CDATA[a < b]]></text></svg><![if !IE]><p>x</p><![endif]>")
+prettifier = load_prettifier()
+
+
+def css_cases() -> dict:
+    """Return {name: css} of the corpus for the CSS checks."""
+    cases = {f"edge-{number}": css
+             for number, css in enumerate(CSS_EDGE_CASES)}
+    for seed, size, density in itertools.product(
+            range(3), (2_000, 30_000), (0.0, 0.5)):
+        cases[f"css-{seed}-{size}-{density}"] = make_css(
+            size, prefix_density=density, seed=seed)
+    return cases
+
+
+def html_cases() -> dict:
+    """Return {name: html} of the corpus for the HTML checks."""
+    return {f"html-{seed}-{depth}": make_html(10_000, depth, seed)
+            for seed, depth in itertools.product(range(3), (2, 12))}
+
+
+def digest(text: str) -> str:
+    """Return the SHA-256 of a text."""
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def fixed_point_mismatches() -> list:
+    """Return the cases that change when prettified a second time."""
+    mismatches = []
+    for name, css in css_cases().items():
+        for justify, group in itertools.product((0, 1), repeat=2):
+            pretty = prettifier.css_prettify(css, justify, False, group)
+            if prettifier.css_prettify(pretty, justify, False, group) != (
+                    pretty):
+                mismatches.append(f"fixed point {name}-j{justify}g{group}")
+    cases = dict(html_cases(), **{f"html-edge-{number}": html for number,
+                                  html in enumerate(HTML_EDGE_CASES)})
+    for name, html in cases.items():
+        for indent_width in (2, 4):
+            pretty = prettifier.html_prettify(html, False, indent_width)
+            if prettifier.html_prettify(pretty, False, indent_width) != (
+                    pretty):
+                mismatches.append(f"fixed point {name}-i{indent_width}")
+            if "<![CDATA[a < b]]>" in html and (
+                    "<![CDATA[a < b]]>" not in pretty):
+                mismatches.append(f"CDATA lost {name}-i{indent_width}")
+    return mismatches
+
+
+def outputs() -> dict:
+    """Return {case and options: output digest} of the whole corpus."""
+    results = {}
+    for name, css in css_cases().items():
+        for justify, extraline, group in itertools.product((0, 1), repeat=3):
+            results[f"{name}-j{justify}e{extraline}g{group}"] = digest(
+                prettifier.css_prettify(css, justify, extraline, group))
+    for name, html in html_cases().items():
+        for extraline, indent_width in itertools.product((0, 1), (2, 4)):
+            results[f"{name}-e{extraline}i{indent_width}"] = digest(
+                prettifier.html_prettify(html, extraline, indent_width))
+    return results
+
+
+def engine_mismatches() -> list:
+    """Return the CSS cases where another engine differs from css_prettify."""
+    mismatches = []
+    with Pool(2) as pool:
+        for name, css in css_cases().items():
+            for justify, extraline, group in itertools.product(
+                    (0, 1), repeat=3):
+                expected = prettifier.css_prettify(
+                    css, justify, extraline, group)
+                if prettifier.css_prettify_parallel(
+                        css, justify, extraline, group, pool, 1000) != (
+                            expected):
+                    mismatches.append(f"parallel {name}")
+                incremental = prettifier.IncrementalCSS(
+                    justify, extraline, group)
+                incremental.prettify(css[len(css) // 2:] + css[:10])
+                if incremental.prettify(css) != expected:
+                    mismatches.append(f"incremental {name}")
+                if not justify and "".join(prettifier.css_prettify_stream(
+                        (css[i:i + 97] for i in range(0, len(css), 97)),
+                        False, extraline, group)) != expected:
+                    mismatches.append(f"stream {name}")
+    return mismatches
+
+
+def check() -> list:
+    """Return the list of failed checks, empty if all are golden."""
+    with open(GOLDEN_PATH, encoding="utf-8") as golden_file:
+        golden = json.load(golden_file)
+    results = outputs()
+    names = sorted(golden.keys() | results.keys())
+    failures = [f"output {name}" for name in names
+                if golden.get(name) != results.get(name)]
+    return failures + engine_mismatches() + fixed_point_mismatches()
+
+
+def main():
+    """Check the outputs against golden.json, or update it."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--update", action="store_true",
+                        help="Write the current outputs as the golden ones.")
+    options = parser.parse_args()
+    if options.update:
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as golden_file:
+            json.dump(outputs(), golden_file, indent=1, sort_keys=True)
+        print(f"Updated {GOLDEN_PATH}.")
+        return
+    failures = check()
+    for failure in failures:
+        print(f"Not golden: {failure}")
+    print(f"{len(failures)} failures.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
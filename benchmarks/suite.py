@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark suite, times the engines and the folder pipeline of main.
+
+Times css_prettify, sort_properties and html_prettify on the synthetic
+corpus, and a whole folder run of the script. --save writes the results
+as a baseline JSON, --compare diffs a run against one and exits with 1 if
+anything got slower than --threshold, --check runs golden.py first.
+"""
+
+
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from _common import SCRIPT, best_of, load_prettifier
+from corpus import make_css, make_html, write_corpus
+
+
+prettifier = load_prettifier()
+
+
+def folder_run(css_size: int, html_size: int, files: int,
+               repeats: int=3) -> float:
+    """Return the best seconds of the script over a fresh corpus folder."""
+    times = []
+    for _ in range(repeats):
+        with TemporaryDirectory() as folder:
+            write_corpus(folder, files, files, css_size, html_size)
+            started = perf_counter()
+            subprocess.run([sys.executable, SCRIPT, "--no-cache", "--quiet",
+                            "--no-daemon", folder], check=True)
+            times.append(perf_counter() - started)
+    return min(times)
+
+
+def run(options) -> dict:
+    """Return {benchmark: {"seconds": best, "megabytes": input}}."""
+    css = make_css(options.css_size, prefix_density=options.prefix_density)
+    html = make_html(options.html_size, options.depth)
+    benchmarks = {
+        "css_prettify": (prettifier.css_prettify, css),
+        "css_prettify_justify": (prettifier.css_prettify, css, True),
+        "sort_properties": (prettifier.sort_properties, css),
+        "html_prettify": (prettifier.html_prettify, html),
+    }
+    results = {}
+    for name, (function, *arguments) in benchmarks.items():
+        results[name] = {
+            "seconds": best_of(function, *arguments,
+                               repeats=options.repeats),
+            "megabytes": len(arguments[0].encode("utf-8")) / 1024 / 1024}
+    results["folder"] = {
+        "seconds": folder_run(options.css_size // 10,
+                              options.html_size // 10, options.files,
+                              options.repeats),
+        "megabytes": options.files * (options.css_size +
+                                      options.html_size) / 10 / 1024 / 1024}
+    return results
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list:
+    """Print the results against the baseline, return the slower ones."""
+    slower = []
+    print(f"{'benchmark':>22} {'baseline (s)':>13} {'now (s)':>9} "
+          f"{'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("seconds")
+        if not before:
+            print(f"{name:>22} {'-':>13} {result['seconds']:>9.3f}")
+            continue
+        change = result["seconds"] / before - 1
+        if change > threshold:
+            slower.append(name)
+        print(f"{name:>22} {before:>13.3f} {result['seconds']:>9.3f} "
+              f"{change:>+7.1%}{' SLOWER' if change > threshold else ''}")
+    return slower
+
+
+def main():
+    """Run the suite, save it or compare it to a baseline."""
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--save", metavar="PATH",
+                        help="Write the results as a baseline JSON.")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="Diff the results against a baseline JSON.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Fraction slower than the baseline to fail.")
+    parser.add_argument("--check", action="store_true",
+                        help="Run the golden output checks first.")
+    parser.add_argument("--css-size", type=int, default=1024 * 1024)
+    parser.add_argument("--html-size", type=int, default=512 * 1024)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--prefix-density", type=float, default=0.2)
+    parser.add_argument("--files", type=int, default=100,
+                        help="CSS and HTML files each, for the folder run.")
+    parser.add_argument("--repeats", type=int, default=3)
+    options = parser.parse_args()
+    if options.check:
+        import golden
+        failures = golden.check()
+        if failures:
+            sys.exit(f"Not golden: {', '.join(failures)}")
+        print("Golden outputs: OK.")
+    results = run(options)
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        slower = compare(baseline, results, options.threshold)
+    else:
+        slower = []
+        print(f"{'benchmark':>22} {'time (s)':>9} {'MB/s':>8}")
+        for name, result in results.items():
+            print(f"{name:>22} {result['seconds']:>9.3f} "
+                  f"{result['megabytes'] / result['seconds']:>8.2f}")
+    if options.save:
+        with open(options.save, "w", encoding="utf-8") as baseline_file:
+            json.dump({"python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "cpus": os.cpu_count(), "results": results},
+                      baseline_file, indent=2)
+    sys.exit(1 if slower else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,28 +8,60 @@ StandAlone Async cross-platform Prettifier Beautifier for the Web.
 """
 
 
+import filecmp
 import itertools
+import logging
+import mmap
 import os
 import re
+import select
+import struct
 import sys
+import threading
 
-from argparse import ArgumentParser
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, namedtuple
 from datetime import datetime
-from multiprocessing import cpu_count, Pool
-from time import sleep
-from subprocess import getoutput
+from functools import lru_cache, partial
+from io import StringIO, TextIOWrapper
+from time import perf_counter, sleep
+from time import time
 
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    BeautifulSoup = None
-    print("BeautifulSoup4 Not Found, use: pip install BeautifulSoup4")
+# Imported only when used, to keep the start up fast: argparse, bs4,
+# cProfile, ctypes, hashlib, html.parser, json, logging.handlers,
+# multiprocessing, pstats, sqlite3, subprocess, tracemalloc,
+# xml.dom.minidom.
 
 
 __version__ = '2.5.5'
 
 
 start_time = datetime.now()
+log = logging.getLogger("css-html-prettify")
+log.addHandler(logging.NullHandler())  # Silent when used as a library.
+CSS_STREAM_CHUNK_SIZE = 2 ** 16  # Characters read per chunk on --stream.
+CSS_SHARD_SIZE = 2 ** 20  # Characters per shard on css_prettify_parallel.
+INCREMENTAL_NAMES = 256  # Named CSS parses a Prettifier keeps, LRU.
+CACHE_FILE_PATH = os.path.join(os.environ.get("XDG_CACHE_HOME") or
+                               os.path.expanduser("~/.cache"),
+                               "css-html-prettify.sqlite3")
+DAEMON_SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or
+                                  os.path.expanduser("~/.cache"),
+                                  "css-html-prettify.sock")
+DAEMON_TIMEOUT = 1  # Seconds to connect and handshake, not for the run.
+result_cache = None  # ResultCache used by the file processors, if any.
+css_shard_pool = None  # Pool for css_prettify_parallel on single big files.
+cancelled_run = None  # Shared Value, the last pool run --fail-fast stopped.
+pool_runs = itertools.count(1)  # Numbers the runs given to a pool.
+incremental_css = None  # IncrementalCSSCache of the main process, watching.
+stage_stats = None  # {stage: [calls, seconds, bytes in, bytes out, peak]}.
+stage_peak = 0  # Peak memory of the running stages, for nested ones.
+MMAP_MIN_SIZE = 2 ** 16  # Bytes, smaller files are faster to read than mmap.
+IN_CLOSE_WRITE, IN_MOVED_TO, IN_Q_OVERFLOW = 0x8, 0x80, 0x4000  # inotify.h
+IGNORE_FILES = (".gitignore", ".prettifyignore")  # Honored on folders.
+IGNORE_DEFAULT = ("node_modules/", )  # Ignored unless an ignore file has !.
+MINIFIED_LINE_LENGTH = 1000  # Bytes, files with longer lines are minified.
+file_sizes = {}  # Size of the files found by scan_files, for the scheduler.
 CSS_PROPS_TEXT = '''
 
 alignment-adjust alignment-baseline animation animation-delay
@@ -122,6 +154,98 @@ z-index
 '''  # Do Not compact this string, new lines are used to Group up stuff.
 
 
+###############################################################################
+# Stats, opt-in instrumentation of the prettify stages
+
+
+def _text_size(text) -> int:
+    """Return the size in bytes of a text, 0 if its not a text."""
+    return len(text.encode("utf-8", "surrogatepass")) if isinstance(
+        text, str) else 0
+
+
+def _stage(function, *arguments):
+    """Run a prettify stage, recording it on stage_stats if enabled.
+
+    Records wall time, bytes in (first argument) and out, and the peak of
+    memory allocated over what was allocated before, stages can be nested.
+    Peaks need tracemalloc.reset_peak(), older than Python 3.9 they are 0.
+    """
+    global stage_peak
+    if stage_stats is None:
+        return function(*arguments)
+    import tracemalloc
+    peaks = hasattr(tracemalloc, "reset_peak")
+    allocated, peak = tracemalloc.get_traced_memory() if peaks else (0, 0)
+    outer_peak, stage_peak = max(stage_peak, peak), 0
+    if peaks:
+        tracemalloc.reset_peak()
+    started = perf_counter()
+    result = function(*arguments)
+    seconds = perf_counter() - started
+    peak = max(tracemalloc.get_traced_memory()[1] if peaks else 0, stage_peak)
+    stage_peak = max(outer_peak, peak)
+    record = stage_stats.setdefault(
+        getattr(function, "func", function).__qualname__.rpartition(
+            "<locals>.")[2], [0, 0.0, 0, 0, 0])
+    record[0] += 1
+    record[1] += seconds
+    record[2] += _text_size(arguments[0])
+    record[3] += _text_size(result)
+    record[4] = max(record[4], peak - allocated)
+    return result
+
+
+def enable_stats():
+    """Start recording the stages on stage_stats, on this process."""
+    global stage_stats
+    import tracemalloc
+    stage_stats = {}
+    if hasattr(tracemalloc, "reset_peak") and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def merge_stats(total: dict, stats: dict) -> dict:
+    """Add the stages of stats to total, peaks are the max, return total."""
+    for stage, (calls, seconds, bytes_in, bytes_out, peak) in stats.items():
+        record = total.setdefault(stage, [0, 0.0, 0, 0, 0])
+        record[0] += calls
+        record[1] += seconds
+        record[2] += bytes_in
+        record[3] += bytes_out
+        record[4] = max(record[4], peak)
+    return total
+
+
+def stats_table(stats: dict) -> str:
+    """Return the stages of stats as a text table, slowest first."""
+    lines = [f"{'stage':>32} {'calls':>7} {'time (s)':>9} {'MB in':>8} "
+             f"{'MB out':>8} {'MB/s':>8} {'peak MB':>8}"]
+    for stage, (calls, seconds, bytes_in, bytes_out, peak) in sorted(
+            stats.items(), key=lambda item: item[1][1], reverse=True):
+        megabytes = bytes_in / 1024 / 1024
+        lines.append(
+            f"{stage:>32} {calls:>7} {seconds:>9.3f} {megabytes:>8.2f} "
+            f"{bytes_out / 1024 / 1024:>8.2f} "
+            f"{megabytes / seconds if seconds else 0:>8.2f} "
+            f"{peak / 1024 / 1024:>8.2f}")
+    return "\n".join(lines)
+
+
+def stats_json(stats: dict, files: dict) -> dict:
+    """Return total and per file stats as a dict ready for JSON."""
+    def as_dict(stages: dict) -> dict:
+        return {stage: dict(zip(("calls", "seconds", "bytes_in", "bytes_out",
+                                 "peak_bytes"), record))
+                for stage, record in stages.items()}
+
+    return {"version": __version__, "started": start_time.isoformat(),
+            "seconds": (datetime.now() - start_time).total_seconds(),
+            "stages": as_dict(stats),
+            "files": {file_path: as_dict(stages)
+                      for file_path, stages in files.items()}}
+
+
 ###############################################################################
 # CSS prettify
 
@@ -145,19 +269,89 @@ def _compile_props(props_text: str, grouped: bool=False) -> tuple:
     return (final_props, groups)
 
 
-def _prioritify(line_of_css: str, css_props_text_as_list: tuple) -> tuple:
+def _compile_props_index(props_text: str) -> dict:
+    """Take a list of props and index them as {prop: (priority, group)}."""
+    props, groups = _compile_props(props_text, grouped=True)
+    props_index = {}
+    for priority, (prop, group) in enumerate(zip(props, groups)):
+        props_index.setdefault(prop, (priority, group))  # 1st match wins.
+    return props_index
+
+
+CSS_PROPS_INDEX = {}  # Built only once, on first use by css_props_index.
+
+
+def css_props_index() -> dict:
+    """Return the CSS_PROPS_INDEX, building it on first use.
+
+    Runs without CSS, like --version or HTML only ones, never build it.
+    """
+    if not CSS_PROPS_INDEX:
+        CSS_PROPS_INDEX.update(_compile_props_index(CSS_PROPS_TEXT))
+    return CSS_PROPS_INDEX
+
+
+RE_ZERO_UNITS = re.compile(r"([\s:])(0)(px|em|%|in|q|ch|cm|mm|pc|pt|ex|rem|"
+                           r"s|ms|deg|grad|rad|turn|vw|vh|vmin|vmax|fr)")
+RE_SEMICOLONS = re.compile(r";;+")
+RE_EMPTY_RULES = re.compile(r"[^\}\{]+\{\}")
+RE_NEWLINES = re.compile(r"\n{6,}")
+RE_BLANK_LINES = re.compile(r"\n{4,}")  # Cap at 2 blank lines, a fixed point.
+RE_SPACES_BRACE = re.compile(r"\s{2,}{\n")
+RE_CSS_CUT = re.compile(r"\}\s*\n(?=[^\s{0])")  # Safe cuts for all stages.
+RE_CSS_RULES_END = re.compile(r"\}")  # Cuts before _css_rules_stage.
+RE_CSS_LINES_END = re.compile(r"\}\s*\n(?=[^\s{])")  # Like _is_css_lines_cut.
+RE_DECLARATIONS = re.compile(r"""(?:[^;("']|\([^)]*\)|"[^"]*"|'[^']*')+""")
+RE_LINE_BREAKS = re.compile("[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")  # Not \n.
+RE_TRAILING_SPACES = re.compile(r"(?<![^\S\n])[^\S\n]+\n")
+RE_LONG_SELECTORS = re.compile(r"^([*.#][^\n]{80,})\n", re.MULTILINE)
+
+
+def _scan_rules(css: str) -> tuple:
+    """Scan CSS into (head, body, closing) blocks split at the { } braces.
+
+    head is everything up to and including the next '{' plus its new line,
+    body runs until the first '}', anything without a '{ }' pair left is
+    returned as a head alone. Same cuts as the old regex, but in one pass.
+    """
+    position, length = 0, len(css)
+    while position < length:
+        opening = css.find("{", position)
+        closing = css.find("}", opening + 1) if opening != -1 else -1
+        if closing == -1:
+            yield css[position:], "", ""
+            return
+        body_start = opening + 1
+        if css.startswith("\r", body_start):
+            body_start += 1
+        if css.startswith("\n", body_start):
+            body_start += 1
+        yield css[position:body_start], css[body_start:closing], "}"
+        position = closing + 1
+
+
+def _scan_props(css_body: str) -> list:
+    """Scan a rule body into props, each one ends at the line of its ';'."""
+    props, position = [], 0
+    while True:
+        semicolon = css_body.find(";", position)
+        newline = -1 if semicolon == -1 else css_body.find("\n", semicolon)
+        if newline == -1:
+            props.append(css_body[position:])
+            return props
+        props.append(css_body[position:newline + 1])
+        position = newline + 1
+
+
+def _prioritify(line_of_css: str, grouped: bool=False) -> tuple:
     """Return args priority, priority is integer and smaller means higher."""
-    sorted_css_properties, groups_by_alphabetic_order = css_props_text_as_list
-    priority_integer, group_integer = 9999, 0
-    for css_property in sorted_css_properties:
-        if css_property.lower() == line_of_css.split(":")[0].lower().strip():
-            priority_integer = sorted_css_properties.index(css_property)
-            group_integer = groups_by_alphabetic_order[priority_integer]
-            break
-    return (priority_integer, group_integer)
+    priority_integer, group_integer = (
+        CSS_PROPS_INDEX or css_props_index()).get(
+        line_of_css.split(":")[0].lower().strip(), (9999, 0))
+    return (priority_integer, group_integer if grouped else 0)
 
 
-def _props_grouper(props, pgs):
+def _props_grouper(props, grouped: bool=False):
     """Return groups for properties."""
     if not props:
         return props
@@ -165,7 +359,7 @@ def _props_grouper(props, pgs):
         # _ if _.strip().endswith(";") and
         # not _.strip().endswith("*/") and not _.strip().endswith("/*")
         # else _.rstrip() + ";\n" for _ in props])
-    props_pg = zip(map(lambda prop: _prioritify(prop, pgs), props), props)
+    props_pg = zip(map(lambda prop: _prioritify(prop, grouped), props), props)
     props_pg = sorted(props_pg, key=lambda item: item[0][1])
     props_by_groups = map(
         lambda item: list(item[1]),
@@ -181,124 +375,150 @@ def _props_grouper(props, pgs):
     return props
 
 
-def sort_properties(css_unsorted_string: str) -> str:
+def sort_properties(css_unsorted_string: str, grouped: bool=False) -> str:
     """CSS Property Sorter Function.
 
     This function will read buffer argument, split it to a list by lines,
     sort it by defined rule, and return sorted buffer if it's CSS property.
     This function depends on '_prioritify' function.
     """
-    css_pgs = _compile_props(CSS_PROPS_TEXT, grouped=bool(args.group))
-    pattern = re.compile(r'(.*?{\r?\n?)(.*?)(}.*?)|(.*)',
-                         re.DOTALL + re.MULTILINE)
-    matched_patterns = pattern.findall(css_unsorted_string)
-    sorted_patterns, sorted_buffer = [], css_unsorted_string
-    RE_prop = re.compile(r'((?:.*?)(?:;)(?:.*?\n)|(?:.*))',
-                         re.DOTALL + re.MULTILINE)
-    if len(matched_patterns) != 0:
-        for matched_groups in matched_patterns:
-            sorted_patterns += matched_groups[0].splitlines(True)
-            props = map(lambda line: line.lstrip('\n'),
-                        RE_prop.findall(matched_groups[1]))
-            props = list(filter(lambda line: line.strip('\n '), props))
-            props = _props_grouper(props, css_pgs)
-            sorted_patterns += props
-            sorted_patterns += matched_groups[2].splitlines(True)
-            sorted_patterns += matched_groups[3].splitlines(True)
-        sorted_buffer = ''.join(sorted_patterns)
-    return sorted_buffer
+    sorted_patterns = []
+    for head, body, closing in _scan_rules(css_unsorted_string):
+        sorted_patterns.append(head)
+        props = [prop.lstrip('\n') for prop in _scan_props(body)]
+        props = [prop for prop in props if prop.strip('\n ')]
+        sorted_patterns += _props_grouper(props, grouped)
+        sorted_patterns.append(closing)
+    return ''.join(sorted_patterns)
 
 
 def remove_empty_rules(css: str) -> str:
     """Remove empty rules."""
-    return re.sub(r"[^\}\{]+\{\}", "", css)
+    return RE_EMPTY_RULES.sub("", css)
 
 
 def condense_zero_units(css: str) -> str:
     """Replace `0(px, em, %, etc)` with `0`."""
-    return re.sub(r"([\s:])(0)(px|em|%|in|q|ch|cm|mm|pc|pt|ex|rem|s|ms|"
-                  r"deg|grad|rad|turn|vw|vh|vmin|vmax|fr)", r"\1\2", css)
+    return RE_ZERO_UNITS.sub(r"\1\2", css)
 
 
 def condense_semicolons(css: str) -> str:
     """Condense multiple adjacent semicolon characters into one."""
-    return re.sub(r";;+", ";", css)
+    return RE_SEMICOLONS.sub(";", css)
+
+
+def _wrap_css_pieces(css_pieces, line_length: int=80):
+    """Wrap consecutive pieces of CSS as if they were a single string."""
+    line_start, pending_newline = 0, False  # line_start is piece relative.
+    for css in css_pieces:
+        if pending_newline and css:
+            yield "\n"
+            pending_newline = False
+        piece_start, i = 0, css.find('}')
+        while i != -1:  # Its safe to break after } characters.
+            if i - line_start >= line_length:
+                yield css[piece_start:i + 1]
+                if i + 1 < len(css):
+                    yield "\n"
+                else:
+                    pending_newline = True
+                piece_start = line_start = i + 1
+            i = css.find('}', i + 1)
+        if piece_start < len(css):
+            yield css[piece_start:]
+        line_start -= len(css)
 
 
 def wrap_css_lines(css: str, line_length: int=80) -> str:
     """Wrap the lines of the given CSS to an approximate length."""
-    print(f"Wrapping lines to ~{line_length} max line lenght.")
-    lines, line_start = [], 0
-    for i, char in enumerate(css):
-        # Its safe to break after } characters.
-        if char == '}' and (i - line_start >= line_length):
-            lines.append(css[line_start:i + 1])
-            line_start = i + 1
-    if line_start < len(css):
-        lines.append(css[line_start:])
-    return "\n".join(lines)
+    log.debug("Wrapping lines to ~%s max line lenght.", line_length)
+    return "".join(_wrap_css_pieces((css, ), line_length))
 
 
 def add_encoding(css: str) -> str:
     """Add @charset 'UTF-8'; if missing."""
-    return "@charset utf-8;\n\n\n" + css if "@charset" not in css else css
-
-
-def normalize_whitespace(css: str) -> str:
-    """Normalize css string white spaces."""
-    css_no_trailing_whitespace = ""
-    for line_of_css in css.splitlines():  # remove all trailing white spaces
-        css_no_trailing_whitespace += line_of_css.rstrip() + "\n"
-    css = css_no_trailing_whitespace
-    css = re.sub(r"\n{3}", "\n\n\n", css)  # if 3 new lines,make them 2
-    css = re.sub(r"\n{5}", "\n\n\n\n\n", css)  # if 5 new lines, make them 4
-    css = re.sub(r"\n{6,}", f"\n\n\n/*{'-' * 72}*/\n\n\n", css)
+    if "@charset" in css:
+        return css
+    return "@charset utf-8;\n" + ("\n\n" + css if css.strip() else "")
+
+
+def _end_lines(css: str) -> str:
+    """Return css ended with a new line, like joining its lines with them."""
+    return css + "\n" if css and not css.endswith("\n") else css
+
+
+def normalize_whitespace(css: str, is_end: bool=True) -> str:
+    """Normalize css string white spaces, is_end strips the trailing ones."""
+    if RE_LINE_BREAKS.search(css):  # splitlines() also splits on them.
+        css = "".join([line_of_css.rstrip() + "\n"  # remove trailing spaces
+                       for line_of_css in css.splitlines()])
+    else:  # Same, without a copy of every line.
+        css = RE_TRAILING_SPACES.sub("\n", _end_lines(css))
+    css = RE_NEWLINES.sub(f"\n\n\n/*{'-' * 72}*/\n\n\n", css)
+    css = RE_BLANK_LINES.sub("\n\n\n", css)
     css = css.replace(" ;\n", ";\n").replace("{\n", " {\n")
-    css = re.sub("\s{2,}{\n", " {\n", css)
-    return css.replace("\t", "    ").rstrip() + "\n"
-
-
-def justify_right(css: str) -> str:
-    """Justify to the Right all CSS properties on the argument css string."""
-    max_indent, right_justified_css = 1, ""
-    for css_line in css.splitlines():
-        c_1 = len(css_line.split(":")) == 2 and css_line.strip().endswith(";")
-        c_2 = "{" not in css_line and "}" not in css_line and len(css_line)
-        c_4 = not css_line.lstrip().lower().startswith("@import ")
-        if c_1 and c_2 and c_4:
-            lenght = len(css_line.split(":")[0].rstrip()) + 1
-            max_indent = lenght if lenght > max_indent else max_indent
-    for line_of_css in css.splitlines():
-        c_1 = "{" not in line_of_css and "}" not in line_of_css
-        c_2 = max_indent > 1 and len(line_of_css.split(":")) == 2
-        c_3 = line_of_css.strip().endswith(";") and len(line_of_css)
-        c_4 = "@import " not in line_of_css
-        if c_1 and c_2 and c_3 and c_4:
-            propert_len = len(line_of_css.split(":")[0].rstrip()) + 1
-            xtra_spaces = " " * (max_indent + 1 - propert_len)
-            xtra_spaces = ":" + xtra_spaces
-            justified_line_of_css = ""
-            justified_line_of_css = line_of_css.split(":")[0].rstrip()
-            justified_line_of_css += xtra_spaces
-            justified_line_of_css += line_of_css.split(":")[1].lstrip()
-            right_justified_css += justified_line_of_css + "\n"
-        else:
-            right_justified_css += line_of_css + "\n"
-    return right_justified_css if max_indent > 1 else css
+    css = RE_SPACES_BRACE.sub(" {\n", css).replace("\t", "    ")
+    return css.rstrip() + "\n" if is_end else css
+
+
+def _justify_props(lines_of_css: list) -> list:
+    """Return (property, value) for each 'property: value;' line, or None."""
+    return [css_line.split(":") if css_line.count(":") == 1 and
+            css_line.rstrip().endswith(";") and
+            "{" not in css_line and "}" not in css_line else None
+            for css_line in lines_of_css]
+
+
+def _justify_max_indent(lines_of_css: list, props: list) -> int:
+    """Return the column to justify the properties at."""
+    return max([len(prop[0].rstrip()) + 1
+                for css_line, prop in zip(lines_of_css, props)
+                if prop and not css_line.lstrip().lower().startswith(
+                    "@import ")], default=1)
+
+
+def justify_max_indent(css: str) -> int:
+    """Return the column justify_right would use for the css string."""
+    lines_of_css = css.splitlines()
+    return _justify_max_indent(lines_of_css, _justify_props(lines_of_css))
+
+
+def justify_right(css: str, max_indent: int=None) -> str:
+    """Justify to the Right all CSS properties on the argument css string.
+
+    max_indent is the column to justify at, computed from css if None.
+    """
+    lines_of_css = css.splitlines()
+    props = _justify_props(lines_of_css)
+    if max_indent is None:
+        max_indent = _justify_max_indent(lines_of_css, props)
+    if max_indent <= 1:
+        return css
+    right_justified_css = []
+    for line_of_css, prop in zip(lines_of_css, props):
+        if prop and "@import " not in line_of_css:
+            propert = prop[0].rstrip()
+            line_of_css = (f"{propert}:{' ' * (max_indent - len(propert))}"
+                           f"{prop[1].lstrip()}")
+        right_justified_css.append(line_of_css + "\n")
+    return "".join(right_justified_css)
+
+
+def _split_selector(line: str) -> str:
+    """Return the line split on its commas if its a too large selector."""
+    if len(line) > 80 and "," in line and line.strip().endswith("{") and (
+            line.startswith(("*", ".", "#"))):
+        return line.replace(", ", ",").replace(",", ",\n").replace(
+            "{", "{\n")
+    return line + "\n"
 
 
 def split_long_selectors(css: str) -> str:
     """Split too large CSS Selectors chained with commas if > 80 chars."""
-    result = ""
-    for line in css.splitlines():
-        cond_1 = len(line) > 80 and "," in line and line.strip().endswith("{")
-        cond_2 = line.startswith(("*", ".", "#"))
-        if cond_1 and cond_2:
-            result += line.replace(", ", ",").replace(",", ",\n").replace(
-                "{", "{\n")
-        else:
-            result += line + "\n"
-    return result
+    if RE_LINE_BREAKS.search(css):  # splitlines() also splits on them.
+        return "".join([_split_selector(line) for line in css.splitlines()])
+    return RE_LONG_SELECTORS.sub(  # Same, only the long lines are copied.
+        lambda match: _split_selector(match.group(1)), _end_lines(css))
 
 
 def simple_replace(css: str) -> str:
@@ -307,98 +527,1058 @@ def simple_replace(css: str) -> str:
         "}\n.", "}\n\n.").replace("}\n*", "}\n\n*")
 
 
-def css_prettify(css: str, justify: bool=False, extraline: bool=False) -> str:
+def css_prettify(css: str, justify: bool=False, extraline: bool=False,
+                 group: bool=False) -> str:
     """Prettify CSS main function."""
-    css = sort_properties(css)
-    css = condense_zero_units(css)
-    css = wrap_css_lines(css, 80)
-    css = split_long_selectors(css)
-    css = condense_semicolons(css)
-    css = normalize_whitespace(css)
-    css = justify_right(css) if justify else css
-    css = add_encoding(css)
-    css = simple_replace(css)
+    css = _stage(sort_properties, css, group)
+    css = _stage(condense_zero_units, css)
+    css = _stage(wrap_css_lines, css, 80)
+    css = _stage(split_long_selectors, css)
+    css = _stage(condense_semicolons, css)
+    css = _stage(normalize_whitespace, css)
+    css = _stage(justify_right, css) if justify else css
+    css = _stage(add_encoding, css)
+    css = _stage(simple_replace, css)
     if extraline:
         css = "\n\n".join(css.replace("\t", "    ").splitlines()) + "\n"
     return css
 
 
+##############################################################################
+# CSS prettify by blocks, for streams and shards
+
+
+def _css_rules_stage(css: str, group: bool=False) -> str:
+    """Run the stages of css_prettify that can be cut after any '}'."""
+    return _stage(condense_zero_units, _stage(sort_properties, css, group))
+
+
+def _css_lines_stage(css: str, is_end: bool=True) -> str:
+    """Run the stages of css_prettify that can be cut on _is_css_lines_cut.
+
+    Does not strip the trailing white spaces unless is_end, so that
+    consecutive segments still join like a single string would.
+    """
+    css = _stage(split_long_selectors, css)
+    css = _stage(condense_semicolons, css)
+    return _stage(normalize_whitespace, css, is_end)
+
+
+def _css_final_stage(css: str, max_indent: int=1, charset: bool=False,
+                     blank_line: bool=False, extraline: bool=False,
+                     is_end: bool=True) -> str:
+    """Run the last stages of css_prettify on a segment from _css_lines_stage.
+
+    charset is for the first segment, blank_line is simple_replace between
+    this segment and the next, and extraline joins to the next like 1 line.
+    """
+    css = _stage(justify_right, css, max_indent) if max_indent > 1 else css
+    css = _stage(simple_replace, _stage(add_encoding, css) if charset else css)
+    css += "\n" if blank_line else ""
+    if extraline:
+        css = "\n\n".join(css.splitlines()) + ("\n" if is_end else "\n\n")
+    return css
+
+
+def _needs_blank_line(css: str, next_css: str) -> bool:
+    """Return True if simple_replace adds a new line between 2 segments."""
+    return css.endswith("}\n") and next_css.startswith(("#", ".", "*"))
+
+
+def _is_css_lines_cut(css: str, newline: int) -> bool:
+    """Return True if css can be cut after the new line at that index.
+
+    The next line must not start with a white space or '{', and before the
+    new line there must be a '}' and only white spaces. All the line based
+    stages work the same on both sides of such a cut.
+    """
+    if newline + 1 >= len(css) or css[newline + 1].isspace() or (
+            css[newline + 1] == "{"):
+        return False
+    before = newline - 1
+    while before >= 0 and css[before].isspace():
+        before -= 1
+    return before >= 0 and css[before] == "}"
+
+
+def _next_css_rules_cut(css: str, position: int) -> int:
+    """Return the first index >= position to cut after a '}', 0 if none."""
+    return css.find("}", position - 1) + 1
+
+
+def _next_css_lines_cut(css: str, position: int) -> int:
+    """Return the first index >= position to cut before the lines, or 0."""
+    newline = css.find("\n", position - 1)
+    while newline != -1:
+        if _is_css_lines_cut(css, newline):
+            return newline + 1
+        newline = css.find("\n", newline + 1)
+    return 0
+
+
+def _cut_css_stream(css_chunks, re_cut, min_size: int=0):
+    """Regroup chunks of CSS into pieces that end at the last re_cut match.
+
+    Each chunk is searched once, after the '}' and white spaces before it
+    that a match can span, so a long block without cuts stays linear.
+    """
+    pieces, size, cut, tail = [], 0, 0, ""
+    for chunk in css_chunks:
+        text, offset = tail + chunk, size - len(tail)
+        pieces.append(chunk)
+        size += len(chunk)
+        for match in re_cut.finditer(text):
+            cut = max(cut, offset + match.end())
+        brace = text.rfind("}")
+        tail = text[brace:] if brace != -1 and (
+            not text[brace + 1:].strip()) else ""
+        if cut and size >= min_size:
+            buffer = "".join(pieces)
+            yield buffer[:cut]
+            pieces, size, cut = [buffer[cut:]], size - cut, 0
+    if size:
+        yield "".join(pieces)
+
+
+def _cut_css_shards(css: str, shard_size: int, next_cut) -> list:
+    """Cut css in shards of about shard_size, where next_cut says."""
+    shards, start = [], 0
+    while len(css) - start > shard_size:
+        cut = next_cut(css, start + shard_size)
+        if not cut:
+            break
+        shards.append(css[start:cut])
+        start = cut
+    return shards + [css[start:]]
+
+
+def _prettify_css_segments(css_segments, justify: bool=False,
+                           extraline: bool=False):
+    """Run the line based stages of css_prettify segment by segment."""
+    css_segments, previous = iter(css_segments), None
+    segment = next(css_segments, "")
+    for next_segment in itertools.chain(css_segments, (None, )):
+        css = _css_lines_stage(segment, is_end=next_segment is None)
+        if previous is not None:
+            yield _css_final_stage(
+                *previous, blank_line=_needs_blank_line(previous[0], css),
+                extraline=extraline, is_end=False)
+        previous = (css, justify_max_indent(css) if justify else 1,
+                    previous is None)
+        segment = next_segment
+    yield _css_final_stage(*previous, extraline=extraline)
+
+
+def css_prettify_stream(css_chunks, justify: bool=False,
+                        extraline: bool=False, group: bool=False):
+    """Prettify CSS main function for streams, yields prettified chunks.
+
+    Takes any iterable of strings and works one block of rules at a time,
+    so memory is bounded by the largest rule and not the whole stylesheet.
+    Output is the same as css_prettify, except that justify aligns each
+    block on its own, and @charset is only looked for on the first block.
+    """
+    rules = _cut_css_stream(css_chunks, RE_CSS_RULES_END)
+    rules = (_css_rules_stage(css, group) for css in rules)
+    lines = _cut_css_stream(_wrap_css_pieces(rules, 80), RE_CSS_LINES_END,
+                            CSS_STREAM_CHUNK_SIZE)
+    yield from _prettify_css_segments(lines, justify, extraline)
+
+
+def css_prettify_parallel(css: str, justify: bool=False,
+                          extraline: bool=False, group: bool=False,
+                          pool=None, shard_size: int=CSS_SHARD_SIZE) -> str:
+    """Prettify CSS main function for huge stylesheets, using a Pool.
+
+    Cuts css in shards of about shard_size at the same safe boundaries as
+    css_prettify_stream, prettifies them on the pool and joins them back.
+    Output is identical to css_prettify, the justify column is the max of
+    all the shards and @charset is looked for on all of them.
+    """
+    shards = _cut_css_shards(css, shard_size, _next_css_rules_cut)
+    css = _stage(wrap_css_lines, "".join(_pool_stages(  # Sequential, fast.
+        pool, _css_rules_stage, [(shard, group) for shard in shards])))
+    shards = _cut_css_shards(css, shard_size, _next_css_lines_cut)
+    del css
+    shards = _pool_stages(pool, _css_lines_stage, [
+        (shard, number == len(shards) - 1)
+        for number, shard in enumerate(shards)])
+    max_indent = max(pool.map(justify_max_indent, shards)) if justify else 1
+    charset = not any("@charset" in shard for shard in shards)
+    return "".join(_pool_stages(pool, _css_final_stage, [
+        (shard, max_indent, charset and not number,
+         number + 1 < len(shards) and _needs_blank_line(
+             shard, shards[number + 1]),
+         extraline, number == len(shards) - 1)
+        for number, shard in enumerate(shards)]))
+
+
+def _stats_task(function, *arguments) -> tuple:
+    """Return function(*arguments) and the stage_stats it recorded."""
+    global stage_stats
+    stage_stats = None if stage_stats is None else {}
+    return function(*arguments), stage_stats
+
+
+def _pool_stages(pool, function, arguments: list) -> list:
+    """Return pool.starmap(function, arguments), with their stage_stats."""
+    results = pool.starmap(_stats_task, [(function, *function_arguments)
+                                         for function_arguments in arguments])
+    if stage_stats is not None:
+        for _, stats in results:
+            merge_stats(stage_stats, stats or {})
+    return [result for result, _ in results]
+
+
+##############################################################################
+# CSS incremental prettify, for watch and editors
+
+
+def _wrap_css_segment(css: str, line_start: int=0,
+                      line_length: int=80) -> tuple:
+    """Wrap a segment of CSS like _wrap_css_pieces, from a given state.
+
+    line_start is where the last wrap was relative to the segment start,
+    returns the wrapped CSS and line_start relative to the next segment,
+    clamped so that equal states always wrap the next segment equally.
+    """
+    pieces, piece_start, i = [], 0, css.find('}')
+    while i != -1:
+        if i - line_start >= line_length:
+            pieces.append(css[piece_start:i + 1])
+            if i + 1 < len(css):  # Never a trailing new line, like a whole.
+                pieces.append("\n")
+            piece_start = line_start = i + 1
+        i = css.find('}', i + 1)
+    pieces.append(css[piece_start:])
+    return "".join(pieces), max(line_start - len(css), -line_length)
+
+
+def _common_length(old: str, new: str, limit: int, suffix: bool=False,
+                   step: int=2 ** 16) -> int:
+    """Return the length of the common prefix, or suffix, up to limit."""
+    def same(start: int, end: int) -> bool:
+        if suffix:
+            return (old[len(old) - end:len(old) - start] ==
+                    new[len(new) - end:len(new) - start])
+        return old[start:end] == new[start:end]
+
+    start = 0
+    while start < limit and same(start, min(start + step, limit)):
+        start = min(start + step, limit)
+    if start == limit:
+        return limit
+    low, high = start, min(start + step, limit)  # Binary search the block.
+    while high - low > 1:
+        middle = (low + high) // 2
+        low, high = (middle, high) if same(start, middle) else (low, middle)
+    return low
+
+
+class IncrementalCSS(object):
+    """Prettify the new versions of a CSS document redoing only what changed.
+
+    Keeps the previous parse: the rule boundaries where all the stages can
+    be cut (RE_CSS_CUT), and for each segment its wrap state, line stages
+    output and justify indent. The changed span is found comparing the old
+    and new CSS, only its segments are prettified and spliced, plus the
+    next ones until the wrap state is the same as before. The final stage
+    is redone for all only if the justify column changed. Output is
+    identical to css_prettify.
+    """
+
+    def __init__(self, justify: bool=False, extraline: bool=False,
+                 group: bool=False):
+        self.justify, self.extraline, self.group = justify, extraline, group
+        self.state = ("", [], [], [], None, None)
+
+    def _segment(self, css: str, wrap_in: int, is_end: bool) -> tuple:
+        """Return the record of a segment, (wrap_in, wrap_out, css, indent)."""
+        css, wrap_out = _wrap_css_segment(_css_rules_stage(css, self.group),
+                                          wrap_in)
+        css = _css_lines_stage(css, is_end)
+        return (wrap_in, wrap_out, css,
+                justify_max_indent(css) if self.justify else 1)
+
+    def _final(self, records: list, number: int, max_indent: int,
+               charset: bool) -> str:
+        """Return the final stage output of the segment number."""
+        is_end = number == len(records) - 1
+        css = records[number][2]
+        return _css_final_stage(
+            css, max_indent, charset and not number, not is_end and
+            _needs_blank_line(css, records[number + 1][2]), self.extraline,
+            is_end)
+
+    def prettify(self, css: str) -> str:
+        """Return the prettified CSS string, and keep its parse for later.
+
+        Only reads the previous parse and replaces it at the end, so calls
+        from many threads at once are safe, at worst they redo some work.
+        """
+        old_css, lengths, records, finals, old_max, old_charset = self.state
+        prefix = _common_length(old_css, css, min(len(old_css), len(css)))
+        if prefix == len(old_css) == len(css) and records:
+            return "".join(finals)
+        suffix = _common_length(old_css, css, min(len(old_css), len(css)) -
+                                prefix, suffix=True)
+        starts = [0] + list(itertools.accumulate(lengths))
+        delta = len(css) - len(old_css)
+        # Redo from the segment of the char before the first change, up to
+        # the first one kept, its cut only looks back on the common suffix.
+        first = max(bisect_right(starts, prefix - 1) - 1, 0)
+        last = max(min(bisect_left(starts, len(old_css) - suffix) + 1,
+                       len(records)), first)
+        region = css[starts[first]:starts[last] + delta]
+        cuts = [match.end() for match in RE_CSS_CUT.finditer(region)]
+        new_lengths = [end - start for start, end in zip(
+            [0] + cuts, cuts + [len(region)]) if end > start]
+        wrap = records[first][0] if records else 0
+        new_records, position = [], starts[first]
+        for number, length in enumerate(new_lengths):
+            is_end = last == len(records) and number == len(new_lengths) - 1
+            new_records.append(self._segment(
+                css[position:position + length], wrap, is_end))
+            wrap, position = new_records[-1][1], position + length
+        while last < len(records) and records[last][0] != wrap:  # Resync.
+            new_lengths.append(lengths[last])
+            new_records.append(self._segment(
+                css[position:position + lengths[last]], wrap,
+                last == len(records) - 1))
+            position += lengths[last]
+            wrap, last = new_records[-1][1], last + 1
+        changed = slice(max(first - 1, 0), first + len(new_records))
+        lengths = lengths[:first] + new_lengths + lengths[last:]
+        finals = finals[:first] + [None] * len(new_records) + finals[last:]
+        records = records[:first] + new_records + records[last:]
+        if not records:  # Empty CSS, still gets a @charset.
+            lengths, finals = [0], [None]
+            records, changed = [self._segment("", 0, True)], slice(0, 1)
+        max_indent = max([record[3] for record in records], default=1)
+        charset = "@charset" not in css
+        if max_indent != old_max:
+            changed = slice(0, len(records))
+        elif charset != old_charset and records:
+            finals[0] = self._final(records, 0, max_indent, charset)
+        for number in range(len(records))[changed]:
+            finals[number] = self._final(records, number, max_indent, charset)
+        self.state = (css, lengths, records, finals, max_indent, charset)
+        return "".join(finals)
+
+
+class IncrementalCSSCache(object):
+    """LRU of the IncrementalCSS of each name, safe to share by threads."""
+
+    def __init__(self, size: int=INCREMENTAL_NAMES):
+        self.size, self.lock = size, threading.Lock()
+        self.parses = OrderedDict()  # Least recently used first.
+
+    def get(self, name: str, justify: bool=False, extraline: bool=False,
+            group: bool=False) -> IncrementalCSS:
+        """Return the IncrementalCSS of name, a new one if not kept."""
+        with self.lock:
+            incremental = self.parses.pop(name, None) or IncrementalCSS(
+                justify, extraline, group)
+            self.parses[name] = incremental
+            if len(self.parses) > self.size:
+                self.parses.popitem(last=False)
+        return incremental
+
+
+##############################################################################
+# CSS embedded on HTML
+
+
+@lru_cache(maxsize=1024)  # Identical style blocks are only prettified once.
+def css_prettify_embedded(css: str, justify: bool=False,
+                          group: bool=False) -> str:
+    """Prettify the CSS of a <style> block, like css_prettify but no @charset.
+
+    Memoized, so repeated inline CSS across a folder run is done only once
+    per worker process.
+    """
+    css = "".join(_wrap_css_pieces((_css_rules_stage(css, group), ), 80))
+    css = _css_lines_stage(css)
+    return _css_final_stage(css, justify_max_indent(css) if justify else 1)
+
+
+@lru_cache(maxsize=1024)
+def css_prettify_declarations(css: str, group: bool=False) -> str:
+    """Prettify the CSS of a style="" attribute, sorted on a single line."""
+    props = [prop.strip() for prop in RE_DECLARATIONS.findall(css)]
+    props = sorted(filter(None, props),
+                   key=lambda prop: _prioritify(prop, group)[::-1])
+    return condense_zero_units(" " + "; ".join(props) + ";")[1:] if props \
+        else css
+
+
 ##############################################################################
 # HTML Prettify
 
 
-if BeautifulSoup:
+@lru_cache(maxsize=None)
+def html_prettifier():
+    """Return the HTMLPrettifier class, html.parser imported on first use."""
+    from html.parser import HTMLParser
+
+    class HTMLPrettifier(HTMLParser):
+        """Streaming HTML Prettifier, feed it HTML then close() to get it back.
+
+        Every tag and text goes on its own line, indented indent_width spaces
+        per level as it is parsed, without building a tree. Void elements are
+        not indented into, pre, textarea and script are kept verbatim. The CSS
+        of style blocks and attributes goes through css_prettify_embedded and
+        css_prettify_declarations, on this same parse.
+        """
+
+        VOID_ELEMENTS = frozenset((
+            "area", "base", "br", "col", "embed", "hr", "img", "input",
+            "keygen", "link", "meta", "param", "source", "track", "wbr"))
+        VERBATIM_ELEMENTS = frozenset(("pre", "textarea", "script", "style"))
+
+        def __init__(self, indent_width: int=4, justify: bool=False,
+                     group: bool=False):
+            super().__init__(convert_charrefs=False)  # Keep entities as is.
+            self.justify, self.group = justify, group
+            self.indent, self.lines, self.stack = " " * indent_width, [], []
+            self.text, self.verbatim = [], None  # Raw pieces while verbatim.
+            self.verbatim_tag, self.verbatim_depth = None, 0
+            self.verbatim_css = False  # Is a style block to prettify as CSS.
+            self.endtag_start = None  # Where parse_endtag is at, on rawdata.
+
+        def _emit(self, line: str):
+            self.lines.append(self.indent * len(self.stack) + line)
+
+        def _flush_text(self):
+            if self.text:
+                text = "".join(self.text).strip()
+                self.text.clear()
+                for line in text.splitlines():
+                    if line.strip():
+                        self._emit(line.strip())
+
+        def _close_verbatim(self):
+            css = "".join(self.verbatim[1:-1]) if self.verbatim_css else ""
+            if css.strip():
+                indent = self.indent * (len(self.stack) + 1)
+                lines = css.split("\n")  # Dedent what the last run indented.
+                dedent = min(len(line) - len(line.lstrip())
+                             for line in lines if line.strip())
+                css = "\n".join(line[dedent:] for line in lines)
+                self._emit(self.verbatim[0])
+                css = css_prettify_embedded(css, self.justify, self.group)
+                self.lines += [indent + line if line else line
+                               for line in css.strip("\n").split("\n")]
+                self._emit(self.verbatim[-1])
+            else:
+                self._emit("".join(self.verbatim))
+            self.verbatim, self.verbatim_tag = None, None
+            self.verbatim_depth = 0
+
+        def _start_tag(self, tag: str, attrs: list, slash: str="") -> str:
+            attrs = [(name, css_prettify_declarations(value, self.group))
+                     if name == "style" and value else (name, value)
+                     for name, value in attrs]
+            attributes = "".join(
+                f" {name}" if value is None else " {}=\"{}\"".format(
+                    name, value.replace("&", "&amp;").replace("<", "&lt;")
+                    .replace(">", "&gt;").replace('"', "&quot;"))
+                for name, value in attrs)
+            return f"<{tag}{attributes}{slash}>"
+
+        def handle_starttag(self, tag, attrs):
+            if self.verbatim is not None:
+                self.verbatim.append(self.get_starttag_text())
+                self.verbatim_depth += tag == self.verbatim_tag
+                return
+            self._flush_text()
+            if tag in self.VERBATIM_ELEMENTS:
+                self.verbatim = [self.get_starttag_text()]
+                self.verbatim_tag, self.verbatim_depth = tag, 1
+                self.verbatim_css = tag == "style" and (dict(attrs).get(
+                    "type") or "text/css").lower() == "text/css"
+            elif tag in self.VOID_ELEMENTS:
+                self._emit(self._start_tag(tag, attrs, "/"))
+            else:
+                self._emit(self._start_tag(tag, attrs))
+                self.stack.append(tag)
+
+        def handle_startendtag(self, tag, attrs):
+            if self.verbatim is not None:
+                self.verbatim.append(self.get_starttag_text())
+            else:
+                self._flush_text()
+                self._emit(self._start_tag(tag, attrs, "/"))
+
+        def parse_endtag(self, i):
+            self.endtag_start = i
+            try:
+                return super().parse_endtag(i)
+            finally:
+                self.endtag_start = None
+
+        def _endtag_text(self, tag: str) -> str:
+            start = self.endtag_start  # As written, not lower cased.
+            if start is None:
+                return f"</{tag}>"
+            return self.rawdata[start:self.rawdata.find(">", start + 1) + 1]
+
+        def handle_endtag(self, tag):
+            if self.verbatim is not None:
+                self.verbatim.append(self._endtag_text(tag))
+                self.verbatim_depth -= tag == self.verbatim_tag
+                if not self.verbatim_depth:
+                    self._close_verbatim()
+            elif tag in self.stack:  # Stray end tags are dropped, like BS4.
+                self._flush_text()
+                while self.stack:  # Unclosed tags inside get closed here.
+                    open_tag = self.stack.pop()
+                    self._emit(f"</{open_tag}>")
+                    if open_tag == tag:
+                        break
+
+        def handle_data(self, data):
+            pieces = self.text if self.verbatim is None else self.verbatim
+            pieces.append(data)
+
+        def handle_entityref(self, name):
+            self.handle_data(f"&{name};")
+
+        def handle_charref(self, name):
+            self.handle_data(f"&#{name};")
+
+        def _handle_markup(self, markup: str):
+            if self.verbatim is not None:
+                self.verbatim.append(markup)
+            else:
+                self._flush_text()
+                self._emit(markup)
+
+        def handle_comment(self, data):
+            self._handle_markup(f"<!--{data}-->")
+
+        def handle_decl(self, decl):
+            self._handle_markup(f"<!{decl}>")
+
+        def handle_pi(self, data):
+            self._handle_markup(f"<?{data}>")
+
+        def unknown_decl(self, data):
+            end = "]]>" if data.startswith("CDATA[") else "]>"  # Or if, endif.
+            self._handle_markup(f"<![{data}{end}")
+
+        def prettify(self, html: str) -> str:
+            """Feed all the html and return it prettified."""
+            self.feed(html)
+            return self.close()
+
+        def close(self) -> str:
+            """Finish parsing, close all open tags and return the HTML."""
+            super().close()
+            if self.rawdata:  # Unclosed script or style are left unparsed.
+                self.handle_data(self.rawdata)
+                self.rawdata = ""
+            if self.verbatim is not None:
+                self.verbatim_css = False  # Never closed, keep it as is.
+                self._close_verbatim()
+            self._flush_text()
+            while self.stack:
+                self._emit(f"</{self.stack.pop()}>")
+            html = "\n".join(self.lines) + "\n" if self.lines else ""
+            self.lines.clear()
+            return html
+
+    return HTMLPrettifier
+
+
+def html_prettify(html: str, extraline: bool=False, indent_width: int=4,
+                  justify: bool=False, group: bool=False) -> str:
+    """Prettify HTML main function, with the native HTMLPrettifier."""
+    html = _stage(html_prettifier()(indent_width, justify, group).prettify,
+                  html)
+    if extraline:
+        html = "\n\n".join(html.replace("\t", "    ").splitlines()) + "\n"
+    return html
+
+
+@lru_cache(maxsize=None)
+def beautifulsoup():
+    """Return BeautifulSoup, imported and patched on first use, or None."""
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        return None
     # http://stackoverflow.com/a/15513483
     orig_prettify = BeautifulSoup.prettify
     regez = re.compile(r'^(\s*)', re.MULTILINE)
 
-
     def prettify(self, encoding=None, formatter="minimal", indent_width=4):
         """Monkey Patch the BS4 prettify to allow custom indentations."""
-        print("Monkey Patching BeautifulSoup on-the-fly to process HTML...")
+        log.debug("Monkey Patching BeautifulSoup on-the-fly to process HTML.")
         return regez.sub(r'\1' * indent_width,
                          orig_prettify(self, encoding, formatter))
 
     BeautifulSoup.prettify = prettify
+    return BeautifulSoup
+
+
+def html_prettify_soup(html: str, extraline: bool=False,
+                       indent_width: int=4) -> str:
+    """Prettify HTML with BeautifulSoup4, slower but more tolerant.
+
+    If BeautifulSoup4 is not found uses MiniDOM, that only takes XHTML.
+    """
+    BeautifulSoup = beautifulsoup()
+    if BeautifulSoup:
+        html = _stage(partial(BeautifulSoup.prettify,
+                              indent_width=indent_width),
+                      _stage(BeautifulSoup, html))
+    else:  # XHTML Prettify
+        from xml.dom import minidom
+        html = _stage(partial(minidom.Document.toprettyxml,
+                              indent=" " * indent_width),
+                      _stage(minidom.parseString, html))[22:]
+    if extraline:
+        html = "\n\n".join(html.replace("\t", "    ").splitlines()) + "\n"
+    return html
+
 
+##############################################################################
+# Library API
+
+
+class PrettifyOptions(namedtuple(
+        "PrettifyOptions", ("group", "justify", "extraline", "indent_width",
+                            "beautifulsoup"))):
+    """Options that change the output, parsed command line args fit too."""
+    __slots__ = ()
+
+    @classmethod
+    def from_options(cls, options=None, **kwargs):
+        """Return the fields of an options object, like args, and kwargs."""
+        options = {field: getattr(options, field) for field in cls._fields
+                   if hasattr(options, field)}
+        return cls(**dict(options, **kwargs))
 
-    def html_prettify(html: str, extraline: bool=False) -> str:
-        """Prettify HTML main function."""
-        html = BeautifulSoup(html).prettify()
-        if extraline:
-            html = "\n\n".join(html.replace("\t", "    ").splitlines()) + "\n"
-        return html
-else:
-    # XHTML Prettify
-    def html_prettify(html: str, extraline: bool=False) -> str:
-        """Prettify XHTML main function."""
-        html = minidom.parseString(html).toprettyxml(indent="    ")[22:]
-        if extraline:
-            html = "\n\n".join(html.replace("\t", "    ").splitlines()) + "\n"
-        return html
+
+# namedtuple(defaults=) is Python 3.7+, this works on 3.6 too.
+PrettifyOptions.__new__.__defaults__ = (False, False, False, 4, False)
+
+
+class Prettifier(object):
+    """Reusable in-process Prettifier, to embed on long-running programs.
+
+    Built once from an options object (PrettifyOptions, argparse args, or
+    keyword arguments), it keeps no per call state but the parse of named
+    CSS, the regexes and CSS property index are compiled only once, so it
+    can be shared by threads.
+    """
+
+    def __init__(self, options=None, **kwargs):
+        self.options = PrettifyOptions.from_options(options, **kwargs)
+        self.props_index = css_props_index()
+        self.incremental = IncrementalCSSCache()
+
+    def prettify_css(self, css: str, name: str=None) -> str:
+        """Return the prettified CSS string.
+
+        name, like a file path, keeps the parse of that CSS so the next call
+        with the same name re-prettifies only the rules that changed, to
+        use on editor saves. Only the last INCREMENTAL_NAMES names are kept.
+        """
+        if name is None:
+            return css_prettify(css, self.options.justify,
+                                self.options.extraline, self.options.group)
+        return self.incremental.get(
+            name, self.options.justify, self.options.extraline,
+            self.options.group).prettify(css)
+
+    def prettify_html(self, html: str) -> str:
+        """Return the prettified HTML string."""
+        if self.options.beautifulsoup:
+            return html_prettify_soup(html, self.options.extraline,
+                                      self.options.indent_width)
+        return html_prettify(html, self.options.extraline,
+                             self.options.indent_width, self.options.justify,
+                             self.options.group)
+
+    def prettify_many(self, documents):
+        """Yield prettified documents from (kind, content) pairs in order.
+
+        kind is a file extension like 'css', 'scss', '.html' or 'htm'.
+        """
+        for kind, content in documents:
+            if kind.lower().lstrip(".") in ("html", "htm"):
+                yield self.prettify_html(content)
+            else:
+                yield self.prettify_css(content)
 
 
 ##############################################################################
 
 
-def walk2list(folder: str, target: tuple, omit: tuple=(),
-              showhidden: bool=False, topdown: bool=True,
-              onerror: object=None, followlinks: bool=False) -> tuple:
-    """Perform full walk, gather full path of all files."""
-    oswalk = os.walk(folder, topdown=topdown,
-                     onerror=onerror, followlinks=followlinks)
+RE_GLOB_TOKENS = re.compile(r"\*\*/|\*\*|\*|\?|\[[^\]]+\]|[^*?\[]+|\[")
 
-    return [os.path.abspath(os.path.join(r, f))
-            for r, d, fs in oswalk
-            for f in fs if not f.startswith(() if showhidden else ".") and
-            not f.endswith(omit) and f.endswith(target)]
+
+def _compile_ignore(pattern: str) -> tuple:
+    """Compile a .gitignore style pattern, return (regex, negate, dir_only).
+
+    The regex matches paths relative to the folder of the ignore file, with
+    / as separator, patterns without a / inside match on any subfolder.
+    """
+    negate = pattern.startswith("!")
+    pattern = pattern[1:] if negate else pattern
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    pattern = pattern.lstrip("/") if "/" in pattern else "**/" + pattern
+    regex = []
+    for token in RE_GLOB_TOKENS.findall(pattern):
+        if token == "**/":
+            regex.append("(?:.*/)?")
+        elif token in ("**", "*", "?"):
+            regex.append({"**": ".*", "*": "[^/]*", "?": "[^/]"}[token])
+        elif token.startswith("[") and token.endswith("]") and len(token) > 2:
+            regex.append("[^" + token[2:] if token[1] == "!" else token)
+        else:
+            regex.append(re.escape(token))
+    return re.compile("".join(regex)), negate, dir_only
+
+
+def _read_ignore_file(file_path: str, base: str) -> list:
+    """Return the rules of an ignore file, for paths starting with base."""
+    try:
+        lines = read_text_file(file_path).splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    return [(base, ) + _compile_ignore(line.rstrip()) for line in lines
+            if line.strip() and not line.startswith("#")]
+
+
+def _is_ignored(rel_path: str, is_dir: bool, rules) -> bool:
+    """Return True if rules ignore rel_path, the last matching rule wins."""
+    ignored = False
+    for base, regex, negate, dir_only in rules:
+        if (is_dir or not dir_only) and regex.fullmatch(rel_path[len(base):]):
+            ignored = not negate
+    return ignored
+
+
+def _looks_minified(file_path: str, size: int) -> bool:
+    """Return True if the start of the file has almost no new lines."""
+    if size < MINIFIED_LINE_LENGTH:
+        return False
+    try:
+        with open(file_path, "rb") as text_file:
+            head = text_file.read(8 * MINIFIED_LINE_LENGTH)
+    except OSError:
+        return False
+    return head.count(b"\n") < len(head) // MINIFIED_LINE_LENGTH
+
+
+def scan_files(folder: str, target: tuple, omit: tuple=(), exclude=(),
+               max_size: int=0, minified: bool=False):
+    """Yield the full path of the files to process in folder, as found.
+
+    Walks with os.scandir, skips hidden files and folders, files and
+    folders ignored by the IGNORE_FILES found on the way or by the exclude
+    patterns, files bigger than max_size if any, and files that look
+    minified unless minified. Records their sizes on file_sizes, and logs
+    how many were skipped by size once the whole folder is scanned.
+    """
+    skipped = Counter()
+    excludes = [("", ) + _compile_ignore(pattern) for pattern in exclude]
+    folders = [(os.path.abspath(folder), "", [
+        ("", ) + _compile_ignore(pattern) for pattern in IGNORE_DEFAULT])]
+    while folders:
+        folder, rel_folder, rules = folders.pop()
+        try:
+            with os.scandir(folder) as entries:
+                entries = list(entries)
+        except OSError as error:
+            log.debug("Can not scan %s: %r", folder, error)
+            continue
+        names = {entry.name for entry in entries}
+        for name in IGNORE_FILES:
+            if name in names:
+                rules = rules + _read_ignore_file(
+                    os.path.join(folder, name), rel_folder)
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            rel_path = rel_folder + entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if _is_ignored(rel_path, is_dir, rules) or _is_ignored(
+                        rel_path, is_dir, excludes):
+                    continue
+                if is_dir:
+                    folders.append((entry.path, rel_path + "/", rules))
+                    continue
+                if not entry.name.endswith(target) or entry.name.endswith(
+                        omit) or not entry.is_file():
+                    continue
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            if max_size and size > max_size:
+                log.debug("Skipping %s, its bigger than --max-size.", rel_path)
+                skipped["big"] += 1
+            elif not minified and _looks_minified(entry.path, size):
+                log.debug("Skipping %s, it looks minified.", rel_path)
+                skipped["minified"] += 1
+            else:
+                file_sizes[entry.path] = size
+                yield entry.path
+    if skipped:
+        log.info("Files skipped as bigger than --max-size: %s, as minified: "
+                 "%s.", skipped["big"], skipped["minified"])
 
 
 def process_multiple_files(file_path):
     """Process multiple CSS, HTML files with multiprocessing."""
-    print(f"Process {os.getpid()} is processing {file_path}.")
-    if args.watch:
-        previous = int(os.stat(file_path).st_mtime)
-        print(f"Process {os.getpid()} is Watching {file_path}.")
-        while True:
-            actual = int(os.stat(file_path).st_mtime)
-            if previous == actual:
-                sleep(60)
-            else:
-                previous = actual
-                print("Modification detected on {file_path}.")
-                if file_path.endswith((".css", ".scss")):
-                    process_single_css_file(file_path)
-                else:
-                    process_single_html_file(file_path)
+    log.debug("Process %s is processing %s.", os.getpid(), file_path)
+    if file_path.endswith((".css", ".scss")):
+        return process_single_css_file(file_path)
     else:
-        if file_path.endswith((".css", ".scss")):
-            process_single_css_file(file_path)
-        else:
-            process_single_html_file(file_path)
+        return process_single_html_file(file_path)
+
+
+def process_files(file_paths, run: int=0) -> list:
+    """Process a chunk of files, return [(file_path, result, error, stats)].
+
+    stats are the stage_stats of each file if enabled, else None.
+    --fail-fast stops after the first file that failed, or once the pool
+    run the chunk belongs to is cancelled by a failure on another chunk.
+    """
+    global stage_stats
+    results = []
+    for file_path in file_paths:
+        if run and cancelled_run and run <= cancelled_run.value:
+            break
+        if stage_stats is not None:
+            stage_stats = {}
+        try:
+            results.append((file_path, process_multiple_files(file_path),
+                            None, stage_stats))
+        except Exception as error:  # Report it, keep going with the rest.
+            results.append((file_path, None, f"{error!r}", stage_stats))
+        if args.fail_fast and has_failed(results):
+            break
+    return results
+
+
+def has_failed(results) -> bool:
+    """Return True if any result is an error, or changed on --check."""
+    return any(error or result == "changed"
+               for _, result, error, _ in results)
+
+
+def _init_worker(options, cache, log_queue, cancelled):
+    """Initialize a pool worker process with the options, only once."""
+    global args, result_cache, cancelled_run
+    args, result_cache = options, cache  # Not inherited if start is spawn.
+    cancelled_run = cancelled
+    make_logger(log_queue)
+    if options.stats or options.stats_json:
+        enable_stats()
+
+
+def use_options(options):
+    """Make options the args of this process, with the cache they use."""
+    global args, result_cache
+    args = options
+    if options.no_cache or options.stream:
+        result_cache = None
+    elif not result_cache or result_cache.path != options.cache_file:
+        result_cache = ResultCache.open(options.cache_file, options.cache_size)
+        options.no_cache = not result_cache  # So the pool workers skip it.
+
+
+def process_files_with(options, file_paths, run: int=0) -> list:
+    """Process a chunk of files with options, return like process_files.
+
+    The daemon pool serves runs with different options, so the options
+    travel with each chunk instead of only once when the pool starts.
+    """
+    use_options(options)
+    return process_files(file_paths, run)
+
+
+def _file_size(file_path: str) -> int:
+    """Return the size of a file, 0 if it can not be read."""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def schedule_files(file_paths, jobs: int, window: int=4096):
+    """Yield chunks of files for the pool, largest files first.
+
+    Files are taken by windows, that start small and double up to window
+    files, so the pool starts working while the folder is still scanned.
+    On each window files are packed up to 1/4 of the fair share of bytes
+    of each job, so big files go alone in a chunk at the start, instead of
+    being the long tail at the end, and small files travel together to
+    save on IPC. Sizes come from file_sizes, if scan_files found them.
+    """
+    file_paths, size = iter(file_paths), max(jobs, 1) * 4
+    while True:
+        sizes = {file_path: file_sizes[file_path] if file_path in file_sizes
+                 else _file_size(file_path)
+                 for file_path in itertools.islice(file_paths, size)}
+        if not sizes:
+            return
+        size = min(size * 2, window)
+        chunk_max_size = sum(sizes.values()) / (max(jobs, 1) * 4)
+        chunk, chunk_size = [], 0
+        for file_path in sorted(sizes, key=sizes.get, reverse=True):
+            chunk.append(file_path)
+            chunk_size += sizes[file_path]
+            if chunk_size >= chunk_max_size or len(chunk) >= 64:
+                yield chunk
+                chunk, chunk_size = [], 0
+        if chunk:
+            yield chunk
+
+
+def process_files_in_pool(pool, file_paths, jobs: int) -> list:
+    """Process files on the pool, or here if None, return like process_files.
+
+    --fail-fast stops waiting for the pool after the first failed chunk,
+    and cancels the run, so its chunks left on a warm pool skip the files.
+    """
+    if pool is None:
+        results = process_files(file_paths)
+    else:
+        results, run = [], next(pool_runs)
+        for chunk_results in pool.imap_unordered(partial(
+                process_files_with, args, run=run),
+                schedule_files(file_paths, jobs)):
+            results += chunk_results
+            if args.fail_fast and has_failed(chunk_results):
+                cancelled_run.value = run
+                break
+    for file_path, _, error, _ in results:
+        if error:
+            log.error("Error processing %s: %s", file_path, error)
+    return results
+
+
+def process_changed_files(pool, file_paths, jobs: int) -> list:
+    """Process the files changed while watching, return like process_files.
+
+    Up to jobs files, like an editor save, are processed here to re-use the
+    IncrementalCSS kept for each one, more files go to the pool.
+    """
+    return process_files_in_pool(
+        pool if len(file_paths) > jobs else None, file_paths, jobs)
 
 
-def prefixer_extensioner(file_path: str) -> str:
+def _file_signature(file_path: str) -> tuple:
+    """Return (modification time, size) of a file, None if its missing."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _inotify_init(folders) -> tuple:
+    """Return (inotify fd, {watch: folder}) for folders, (None, {}) if cant.
+
+    Watches folders and not files, so editors that save by renaming a
+    temporary file over the original are detected too.
+    """
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError, TypeError):  # Not Linux.
+        return None, {}
+    if inotify_fd < 0:
+        return None, {}
+    watches = {}
+    for folder in folders:
+        watch = libc.inotify_add_watch(inotify_fd, os.fsencode(folder),
+                                       IN_CLOSE_WRITE | IN_MOVED_TO)
+        if watch < 0:  # Usually fs.inotify.max_user_watches was reached.
+            os.close(inotify_fd)
+            return None, {}
+        watches[watch] = folder
+    return inotify_fd, watches
+
+
+def _inotify_read(inotify_fd: int, watches: dict, timeout: float) -> set:
+    """Wait up to timeout for inotify events, return the changed file paths.
+
+    Returns None if the kernel event queue overflowed, events were lost.
+    """
+    if not select.select((inotify_fd, ), (), (), timeout)[0]:
+        return set()
+    file_paths, data, offset = set(), os.read(inotify_fd, 2 ** 16), 0
+    while offset < len(data):  # struct inotify_event {int wd; uint32 mask;
+        watch, mask, _, length = struct.unpack_from("iIII", data, offset)
+        name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+        offset += 16 + length  # uint32 cookie; uint32 len; char name[];}
+        if mask & IN_Q_OVERFLOW:
+            return None
+        if watch in watches and name:
+            file_paths.add(os.path.join(watches[watch], os.fsdecode(name)))
+    return file_paths
+
+
+def watch_files(file_paths, on_change, interval: float=0.5,
+                debounce: float=0.1):
+    """Call on_change(list_of_changed_files) every time files change.
+
+    A single watcher for all files, uses inotify on Linux, else scans the
+    modification time and size of all files every interval seconds. Bursts
+    of saves are debounced into one call, files are considered changed
+    only if their signature changed, so our own writes are not re-processed.
+    """
+    signatures = {path: _file_signature(path) for path in file_paths}
+    inotify_fd, watches = _inotify_init(
+        {os.path.dirname(path) for path in signatures})
+    log.info("Watching %s files using %s.", len(signatures),
+             "inotify" if watches else "polling")
+
+    def changed_files(timeout: float) -> set:
+        if inotify_fd is None:
+            sleep(timeout)
+            candidates = signatures
+        else:
+            candidates = _inotify_read(inotify_fd, watches, timeout)
+            candidates = signatures if candidates is None else candidates
+        return {path for path in candidates if path in signatures and
+                _file_signature(path) != signatures[path]}
+
+    try:
+        while True:
+            changed = changed_files(None if watches else interval)
+            if not changed:
+                continue
+            newly_changed = changed
+            while newly_changed:  # Debounce, wait until the saves calm down.
+                newly_changed = changed_files(debounce) - changed
+                changed |= newly_changed
+            for path in changed:
+                signatures[path] = _file_signature(path)
+            changed = sorted(path for path in changed if signatures[path])
+            log.info("Modification detected on %s files.", len(changed))
+            try:
+                on_change(changed)
+            except Exception as error:  # Keep watching after a bad file.
+                log.error("Error processing modified files: %r", error)
+            for path in changed:  # Our own writes are not modifications.
+                signatures[path] = _file_signature(path)
+    finally:
+        if inotify_fd is not None:
+            os.close(inotify_fd)
+
+
+def prefixer_extensioner(file_path: str, prefix: str=None) -> str:
     """Take a file path and safely prepend a prefix and change extension.
 
     This is needed because filepath.replace('.foo', '.bar') sometimes may
@@ -406,55 +1586,363 @@ def prefixer_extensioner(file_path: str) -> str:
     """
     extension = os.path.splitext(file_path)[1].lower()
     filenames = os.path.splitext(os.path.basename(file_path))[0]
-    filenames = args.prefix + filenames if args.prefix else filenames
+    filenames = prefix + filenames if prefix else filenames
     dir_names = os.path.dirname(file_path)
     file_path = os.path.join(dir_names, filenames + extension)
     return file_path
 
 
+class ResultCache(object):
+    """Persistent LRU cache of processed files on a SQLite file.
+
+    Maps a hash of the input content plus the options to a hash of the
+    output, if the target file still has that output it can be skipped.
+    """
+
+    def __init__(self, path: str, max_entries: int=100_000):
+        self.path, self.max_entries, self._connection = path, max_entries, None
+
+    @classmethod
+    def open(cls, path: str, max_entries: int=100_000):
+        """Return a ResultCache on path, or None if it can not be opened."""
+        import sqlite3
+        cache = cls(path, max_entries)
+        try:
+            cache.connection
+        except (OSError, sqlite3.Error) as error:
+            log.warning("Cache disabled, can not open %s: %s", path, error)
+            return None
+        return cache
+
+    def __getstate__(self):
+        """Pickle without the connection, to send it to pool workers."""
+        return dict(self.__dict__, _connection=None)
+
+    @property
+    def connection(self):
+        """Return a connection owned by this process, a fork gets its own."""
+        if not self._connection or self._connection[0] != os.getpid():
+            import sqlite3
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                               "key TEXT PRIMARY KEY, output TEXT, used REAL)")
+            self._connection = (os.getpid(), connection)
+        return self._connection[1]
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        """Return a hex hash of the data."""
+        import hashlib
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    def key(self, content: str, options: tuple) -> str:
+        """Return the cache key for the input content and options."""
+        return self.digest(f"{options!r}\n{content}".encode("utf-8"))
+
+    def is_fresh(self, key: str, target_path: str) -> bool:
+        """Return True if target_path has the output cached for that key."""
+        row = self.connection.execute(
+            "SELECT output FROM results WHERE key = ?", (key, )).fetchone()
+        if not row or not os.path.isfile(target_path):
+            return False
+        with open(target_path, "rb") as target_file:
+            if self.digest(target_file.read()) != row[0]:
+                return False
+        self.connection.execute(
+            "UPDATE results SET used = ? WHERE key = ?", (time(), key))
+        return True
+
+    def store(self, key: str, output: str, options: tuple=None):
+        """Remember that this key produced the output.
+
+        If options are given the output was written over its own input, so
+        it is also remembered as already processed, being our own output.
+        """
+        output_hash, used = self.digest(output.encode("utf-8")), time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+            [(key, output_hash, used)] + ([(self.key(output, options),
+                                            output_hash, used)]
+                                          if options else []))
+
+    def evict(self):
+        """Forget the least recently used entries above max_entries."""
+        self.connection.execute(
+            "DELETE FROM results WHERE key NOT IN (SELECT key FROM results "
+            "ORDER BY used DESC LIMIT ?)", (self.max_entries, ))
+
+
+def _cache_options(kind: str) -> tuple:
+    """Return all the options that change the output of a file kind."""
+    return (kind, __version__, args.group, args.justify, args.extraline,
+            args.prefix, args.timestamp, args.indent_width, args.beautifulsoup)
+
+
+def read_text_file(file_path: str) -> str:
+    """Read a text file, faster than open(encoding="utf-8-sig").read().
+
+    Decodes all in one go instead of by chunks through a TextIOWrapper,
+    big files are mmap and decoded zero-copy from the page cache. New
+    lines are translated the same way the text mode does it.
+    """
+    with open(file_path, "rb") as text_file:
+        if os.fstat(text_file.fileno()).st_size < MMAP_MIN_SIZE:
+            text = text_file.read().decode("utf-8-sig")
+        else:
+            with mmap.mmap(text_file.fileno(), 0,
+                           access=mmap.ACCESS_READ) as data:
+                text = str(data, "utf-8-sig")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _temp_file_for(file_path: str) -> tuple:
+    """Return (fd, path) of a new temporary file next to file_path.
+
+    Like tempfile.mkstemp, without importing tempfile and all it imports.
+    file_path should be os.path.realpath'ed, so the temporary file goes
+    next to the file a symlink points to, and replaces that file.
+    """
+    folder, name = os.path.split(file_path)
+    flags = os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    for number in itertools.count():
+        temp_path = os.path.join(folder, f".{name}.{os.getpid()}.{number}.tmp")
+        try:
+            return os.open(temp_path, flags, 0o600), temp_path
+        except FileExistsError:
+            continue
+
+
+def _replace_file(temp_path: str, file_path: str) -> bool:
+    """Atomically rename temp_path over file_path, if their content differ.
+
+    Return True if replaced, False if they were identical and the temp file
+    got removed, so file_path modification time stays the same. file_path
+    must not be a symlink, see _temp_file_for. A file with hard links is
+    written through instead, so all its links keep the new content.
+    """
+    try:
+        identical = filecmp.cmp(temp_path, file_path, shallow=False)
+        stat = os.stat(file_path)
+        mode, links = stat.st_mode, stat.st_nlink
+    except OSError:  # file_path does not exist yet.
+        identical, umask = False, os.umask(0)  # Read it, then restore it.
+        os.umask(umask)
+        mode, links = 0o666 & ~umask, 1
+    if identical:
+        os.remove(temp_path)
+    elif links > 1:
+        with open(temp_path, "rb") as temp_file:
+            with open(file_path, "wb") as target_file:
+                for chunk in iter(partial(temp_file.read, 2 ** 20), b""):
+                    target_file.write(chunk)
+        os.remove(temp_path)
+    else:
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, file_path)
+    return not identical
+
+
+def _encode_text(text: str) -> bytes:
+    """Return the bytes of text as written on a file, UTF-8 and OS lines."""
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def has_text(file_path: str, texts) -> bool:
+    """Return True if the file has exactly the texts, as they are written.
+
+    Compares them one by one, so a stream of texts is never all in memory,
+    stops at the first difference, False if the file is missing.
+    """
+    try:
+        text_file = open(file_path, "rb")
+    except OSError:
+        return False
+    with text_file:
+        for text in texts:
+            data = _encode_text(text)
+            if text_file.read(len(data)) != data:
+                return False
+        return not text_file.read(1)
+
+
+def write_text_file(file_path: str, text: str) -> bool:
+    """Write a text file as UTF-8 atomically, unless it has the same text.
+
+    Compares size first and then content against the file on disk, if
+    identical it is not written, return True if it was written.
+    """
+    data, file_path = _encode_text(text), os.path.realpath(file_path)
+    signature = _file_signature(file_path)
+    if signature and signature[1] == len(data):
+        with open(file_path, "rb") as text_file:
+            if text_file.read() == data:
+                return False
+    temp_fd, temp_path = _temp_file_for(file_path)
+    try:
+        with open(temp_fd, "wb") as text_file:
+            text_file.write(data)
+        return _replace_file(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _css_timestamp() -> str:
+    """Return a CSS comment with the current date and time."""
+    return f"/* {datetime.now().replace(microsecond=0).isoformat(' ')} */ "
+
+
+def prettify_text(file_path: str, text: str) -> str:
+    """Return the output for the text of a CSS or HTML file, as args say."""
+    if not file_path.endswith((".css", ".scss")):
+        if args.beautifulsoup:
+            return html_prettify_soup(text, args.extraline, args.indent_width)
+        return html_prettify(text, args.extraline, args.indent_width,
+                             args.justify, args.group)
+    if args.stream:
+        pretty_css = "".join(css_prettify_stream(
+            iter(partial(StringIO(text).read, CSS_STREAM_CHUNK_SIZE), ""),
+            args.justify, args.extraline, args.group))
+    elif css_shard_pool and len(text) > 2 * args.shard_size:
+        pretty_css = css_prettify_parallel(
+            text, args.justify, args.extraline, args.group,
+            css_shard_pool, args.shard_size)
+    elif incremental_css:
+        pretty_css = incremental_css.get(
+            file_path, args.justify, args.extraline, args.group).prettify(text)
+    else:
+        pretty_css = css_prettify(text, args.justify, args.extraline,
+                                  args.group)
+    return _css_timestamp() + pretty_css if args.timestamp else pretty_css
+
+
+def output_text_file(file_path: str, text: str) -> str:
+    """Write text on file_path, or with --check only compare them.
+
+    Return "written", or "changed" with --check, "skipped" if identical.
+    """
+    if args.check:
+        return "skipped" if has_text(file_path, (text, )) else "changed"
+    return "written" if write_text_file(file_path, text) else "skipped"
+
+
 def process_single_css_file(css_file_path: str) -> str:
-    """Process a single CSS file."""
-    global args
+    """Process a single CSS file, return like output_text_file or "cached".
+
+    Skipped means it had the same output on disk, cached that it was
+    not even processed since its unchanged since last time.
+    """
+    if args.stream:
+        return stream_single_css_file(css_file_path)
+    original_css = read_text_file(css_file_path)
+    min_css_file_path = prefixer_extensioner(css_file_path, args.prefix)
+    if result_cache:
+        cache_key = result_cache.key(original_css, _cache_options("css"))
+        if result_cache.is_fresh(cache_key, min_css_file_path):
+            return "cached"
+    pretty_css = prettify_text(css_file_path, original_css)
+    result = output_text_file(min_css_file_path, pretty_css)
+    if result_cache and result != "changed":
+        result_cache.store(cache_key, pretty_css, _cache_options("css") if
+                           min_css_file_path == css_file_path else None)
+    return result
+
+
+def stream_single_css_file(css_file_path: str) -> str:
+    """Process a single CSS file by chunks, return like output_text_file.
+
+    Output goes to a temporary file that replaces the target at the end,
+    since the target may be the same file that is being read, --check
+    compares it chunk by chunk with the target instead.
+    """
+    min_css_file_path = prefixer_extensioner(css_file_path, args.prefix)
     with open(css_file_path, encoding="utf-8-sig") as css_file:
-        original_css = css_file.read()
-    pretty_css = css_prettify(original_css, args.justify, args.extraline)
-    if args.timestamp:
-        taim = f"/* {datetime.now().replace(microsecond=0).isoformat(' ')} */ "
-        pretty_css = taim + pretty_css
-    min_css_file_path = prefixer_extensioner(css_file_path)
-    with open(min_css_file_path, "w", encoding="utf-8") as output_file:
-        output_file.write(pretty_css)
-    return pretty_css
+        pretty_css = css_prettify_stream(
+            iter(partial(css_file.read, CSS_STREAM_CHUNK_SIZE), ""),
+            args.justify, args.extraline, args.group)
+        if args.timestamp:
+            pretty_css = itertools.chain((_css_timestamp(), ), pretty_css)
+        if args.check:
+            return "skipped" if has_text(
+                min_css_file_path, pretty_css) else "changed"
+        target_path = os.path.realpath(min_css_file_path)
+        temp_fd, temp_path = _temp_file_for(target_path)
+        try:
+            with open(temp_fd, "w", encoding="utf-8") as output_file:
+                output_file.writelines(pretty_css)
+            return "written" if _replace_file(
+                temp_path, target_path) else "skipped"
+        except BaseException:
+            os.remove(temp_path)
+            raise
 
 
 def process_single_html_file(html_file_path: str) -> str:
-    """Process a single HTML file."""
-    with open(html_file_path, encoding="utf-8-sig") as html_file:
-        pretty_html = html_prettify(html_file.read(), args.extraline)
-    html_file_path = prefixer_extensioner(html_file_path)
-    with open(html_file_path, "w", encoding="utf-8") as output_file:
-        output_file.write(pretty_html)
-    return pretty_html
+    """Process a single HTML file, returns like process_single_css_file."""
+    original_html = read_text_file(html_file_path)
+    min_html_file_path = prefixer_extensioner(html_file_path, args.prefix)
+    if result_cache:
+        cache_key = result_cache.key(original_html, _cache_options("html"))
+        if result_cache.is_fresh(cache_key, min_html_file_path):
+            return "cached"
+    pretty_html = prettify_text(html_file_path, original_html)
+    result = output_text_file(min_html_file_path, pretty_html)
+    if result_cache and result != "changed":
+        result_cache.store(cache_key, pretty_html, _cache_options("html") if
+                           min_html_file_path == html_file_path else None)
+    return result
+
+
+def file_diff(file_path: str) -> str:
+    """Return the unified diff of the output file of file_path, for --diff.
+
+    From what is on disk to what it would be, prettified again here since
+    only the few files that fail the --check need it.
+    """
+    from difflib import unified_diff
+    target_path = prefixer_extensioner(file_path, args.prefix)
+    try:
+        on_disk = read_text_file(target_path).splitlines(True)
+    except OSError:
+        on_disk = []
+    return "".join(unified_diff(
+        on_disk, prettify_text(file_path, read_text_file(
+            file_path)).splitlines(True), target_path, target_path))
 
 
 def make_arguments_parser():
     """Build and return a command line agument parser."""
+    from argparse import ArgumentParser
     # Parse command line arguments.
     parser = ArgumentParser(description=__doc__, epilog="""CSS-HTML-Prettify:
     Takes file or folder full path string and process all CSS/SCSS/HTML found.
     If argument is not file/folder will fail. Check Updates works on Python3.
-    StdIn to StdOut is deprecated since may fail with unicode characters.
+    Use - as fullpath to prettify StdIn to StdOut, as --type css or html.
     CSS Properties are AlphaSorted,to help spot cloned ones,Selectors not.
-    Watch works for whole folders, with minimum of ~60 Secs between runs.""")
+    Watch works for whole folders, changes are processed within ~1 Second.""")
     parser.add_argument('--version', action='version', version=__version__)
-    parser.add_argument('fullpath', metavar='fullpath', type=str,
-                        help='Full path to local file or folder.')
+    parser.add_argument('fullpath', metavar='fullpath', type=str, nargs='?',
+                        help='Full path to local file or folder, - is StdIn.')
+    parser.add_argument('--type', type=str, choices=("css", "html"),
+                        default="css", help="Type of StdIn and --batch.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Prettify JSON lines requests of StdIn on "
+                        "StdOut, like {\"content\": \"a{color:red}\"}.")
     parser.add_argument('--prefix', type=str,
                         help="Prefix string to prepend on output filenames.")
     parser.add_argument('--timestamp', action='store_true',
                         help="Add a Time Stamp on all CSS/SCSS output files.")
     parser.add_argument('--quiet', action='store_true',
                         help="Quiet, Silent, force disable all Logging.")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Log also every file and step, slower.")
     parser.add_argument('--after', type=str,
                         help="Command to execute after run (Experimental).")
     parser.add_argument('--before', type=str,
@@ -467,45 +1955,443 @@ def make_arguments_parser():
                         help="Right Justify CSS Properties (Experimental).")
     parser.add_argument('--extraline', action='store_true',
                         help="Add 1 New Line for each New Line (Experimental)")
+    parser.add_argument('--indent-width', type=int, default=4,
+                        help="Number of spaces to indent HTML by level.")
+    parser.add_argument('--beautifulsoup', action='store_true',
+                        help="Prettify HTML with BeautifulSoup4, slower.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Process CSS by chunks for huge files, bounded "
+                        "Memory, Justify per block of rules (Experimental).")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="Number of processes to use on folders.")
+    parser.add_argument('--shard-size', type=int, default=CSS_SHARD_SIZE,
+                        help="Process a CSS file bigger than 2 shards in "
+                        "parallel shards of this many characters, 0 is Off.")
+    parser.add_argument('--stats', action='store_true',
+                        help="Print time, bytes and peak memory by stage.")
+    parser.add_argument('--stats-json', type=str, metavar='PATH',
+                        help="Write the --stats, total and by file, as JSON.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the run with cProfile, only sees "
+                        "this process, use it with --jobs 1 for folders.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Dont skip files unchanged since the last run.")
+    parser.add_argument('--cache-file', type=str, default=CACHE_FILE_PATH,
+                        help="SQLite file to cache unchanged files on.")
+    parser.add_argument('--cache-size', type=int, default=100_000,
+                        help="Maximum number of files to keep on the cache.")
+    parser.add_argument('--exclude', type=str, action='append',
+                        metavar='PATTERN', help="Skip files and folders that "
+                        "match this .gitignore style pattern on folders.")
+    parser.add_argument('--max-size', type=int, default=0, metavar='BYTES',
+                        help="Skip files bigger than this on folders, 0 is "
+                        "no limit.")
+    parser.add_argument('--include-minified', action='store_true',
+                        help="Process files that look minified on folders.")
+    parser.add_argument('--check', action='store_true',
+                        help="Write nothing, exit with 1 if any file is not "
+                        "prettified, listing them, to use on CI.")
+    parser.add_argument('--diff', action='store_true',
+                        help="Like --check, and print their unified diffs.")
+    parser.add_argument('--fail-fast', action='store_true',
+                        help="Stop at the first file with errors, or not "
+                        "prettified on --check.")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Serve runs on --socket with a warm pool, runs "
+                        "are forwarded to it while its running.")
+    parser.add_argument('--socket', type=str, default=DAEMON_SOCKET_PATH,
+                        help="Unix socket file of the --daemon.")
+    parser.add_argument('--no-daemon', action='store_true',
+                        help="Dont forward the run to a running --daemon.")
     global args
     args = parser.parse_args()
+    if not args.fullpath and not args.daemon and not args.batch:
+        parser.error("the following arguments are required: fullpath")
+    if args.fullpath == "-" and (args.watch or args.check or args.daemon):
+        parser.error("- can not be used with --watch, --check or --daemon")
+    args.check = args.check or args.diff
     return args
 
 
+def make_logger(log_queue=None):
+    """Set the level of the logger from args, and where its logs go.
+
+    Pool workers send them to the log_queue, to be written by only one
+    QueueListener on the main process, which writes them to stderr.
+    --quiet drops them all before they are even formatted.
+    """
+    log.setLevel(logging.CRITICAL + 1 if args.quiet else
+                 logging.DEBUG if args.verbose else logging.INFO)
+    log.propagate = False
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+    if log_queue:
+        from logging.handlers import QueueHandler
+        log.addHandler(QueueHandler(log_queue))
+    else:
+        log.addHandler(logging.StreamHandler())
+    return log
+
+
+def make_pool(jobs: int) -> tuple:
+    """Return (pool, log listener) of jobs initialized worker processes."""
+    from logging.handlers import QueueListener
+    global cancelled_run
+    from multiprocessing import Pool, Queue, Value
+    log_queue, cancelled_run = Queue(), Value("q", 0)
+    log_listener = QueueListener(log_queue, *log.handlers)
+    log_listener.start()
+    pool = Pool(jobs, initializer=_init_worker,  # Multiprocess
+                initargs=(args, result_cache, log_queue, cancelled_run))
+    return pool, log_listener
+
+
+def process_target(pool=None) -> tuple:
+    """Process the file or folder of args.fullpath, on a pool if --jobs.
+
+    Uses pool if any, else makes one for folders and huge CSS files.
+    Return (list_of_files, results) like process_files, None if not found.
+    """
+    global css_shard_pool, incremental_css
+    fullpath, log_listener = args.fullpath, None
+    if os.path.isfile(fullpath) and fullpath.endswith(
+            (".css", ".scss")):  # Work based on if argument is file or folder.
+        log.info("Target is a CSS / SCSS File.")
+        list_of_files = str(fullpath)
+        parallel = args.jobs > 1 and args.shard_size and not args.stream and (
+            _file_size(fullpath) > 2 * args.shard_size)
+    elif os.path.isfile(fullpath) and fullpath.endswith((".htm", ".html")):
+        log.info("Target is a HTML File.")
+        list_of_files, parallel = str(fullpath), False
+    elif os.path.isdir(fullpath):
+        log.info("Target is a Folder with CSS / SCSS, HTML, JS.")
+        log.info("Processing a whole Folder may take some time...")
+        list_of_files = scan_files(
+            fullpath, (".css", ".scss", ".html", ".htm"), ".min.css",
+            args.exclude or (), args.max_size, args.include_minified)
+        parallel = args.jobs > 1
+    else:
+        return None
+    pool = pool if parallel else None
+    if parallel and not pool:
+        pool, log_listener = make_pool(args.jobs)
+    try:
+        if isinstance(list_of_files, str):
+            css_shard_pool = pool
+            results = process_files([fullpath])
+        else:
+            if args.watch:  # Here and not in the pool workers, forked.
+                incremental_css = IncrementalCSSCache()
+                list_of_files = list(list_of_files)
+                watch_files(list_of_files, partial(
+                    process_changed_files, pool, jobs=args.jobs))
+            results = process_files_in_pool(pool, list_of_files, args.jobs)
+            list_of_files = [file_path for file_path, _, _, _ in results]
+    finally:
+        css_shard_pool = incremental_css = None
+        file_sizes.clear()  # Only for this run, the daemon serves many.
+        if log_listener:
+            if args.fail_fast:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+            log_listener.stop()
+    return list_of_files, results
+
+
+##############################################################################
+# Daemon, a warm pool that serves runs and content on a Unix socket
+
+
+@lru_cache(maxsize=16)
+def cached_prettifier(options: PrettifyOptions) -> Prettifier:
+    """Return the Prettifier for options, one for each, to serve content."""
+    return Prettifier(options)
+
+
+def serve_content(request: dict, options=None, kind: str="css") -> dict:
+    """Prettify the content of a request, return the response.
+
+    Request is {"content": "...", "kind": "css" or "html", "name": "...",
+    "options": {...}, "id": ...}, response is {"output": "...", "id": ...}.
+    options, like args, and kind are the defaults of the request, name
+    keeps the parse of CSS like Prettifier.prettify_css, id is given back.
+    """
+    prettifier = cached_prettifier(PrettifyOptions.from_options(
+        options, **request.get("options", {})))
+    if request.get("kind", kind).lower().lstrip(".") in ("html", "htm"):
+        response = {"output": prettifier.prettify_html(request["content"])}
+    else:
+        response = {"output": prettifier.prettify_css(
+            request["content"], request.get("name"))}
+    if "id" in request:
+        response["id"] = request["id"]
+    return response
+
+
+def serve_request(request: dict, pool) -> dict:
+    """Serve a request to the daemon, return the response.
+
+    {"args": {...}} runs like the command line with those args would,
+    response is {"files": list_of_files, "results": results}.
+    {"content": "...", ...} prettifies content, like serve_content.
+    Failed requests get {"error": "..."} as response, others like {} get
+    {"version": "..."}, to check that the daemon is running.
+    """
+    from argparse import Namespace
+    if request.get("version") != __version__:
+        return {"error": f"Daemon is version {__version__}."}
+    if "args" not in request and "content" not in request:
+        return {"version": __version__}
+    try:
+        if "content" in request:
+            return serve_content(request)
+        use_options(Namespace(**request["args"]))
+        found = process_target(pool)
+        if not found:
+            return {"error": f"File or folder not found: {args.fullpath}"}
+        if result_cache:
+            result_cache.evict()
+        return {"files": found[0], "results": found[1]}
+    except Exception as error:  # Report it, keep serving the next ones.
+        log.error("Error serving %s: %r", request.get("args", "content"),
+                  error)
+        return {"error": f"{error!r}"}
+
+
+def serve_daemon(socket_path: str):
+    """Serve requests on socket_path, until terminated, with a warm pool.
+
+    Requests and responses are JSON, one by line, serve_request documents
+    them, connections are served one after the other since the pool is
+    already using all the --jobs for each run.
+    """
+    import json
+    import signal
+    import socket
+    if request_daemon({}, socket_path) is not None:
+        log.error("Daemon already running on %s.", socket_path)
+        sys.exit(1)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # Left by a daemon that was killed.
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    css_props_index()
+    pool, log_listener = make_pool(args.jobs) if args.jobs > 1 else (
+        None, None)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)  # Only this user can connect.
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(umask)
+    server.listen()
+    log.info("Daemon listening on %s.", socket_path)
+    try:
+        while True:
+            connection, _ = server.accept()
+            connection.settimeout(60)
+            try:  # A client that hangs up only drops its own connection.
+                with connection, connection.makefile("rwb") as stream:
+                    for line in stream:
+                        stream.write(json.dumps(serve_request(
+                            json.loads(line), pool)).encode("utf-8") + b"\n")
+                        stream.flush()
+            except (OSError, ValueError) as error:
+                log.warning("Daemon connection failed: %r", error)
+    finally:
+        server.close()
+        os.remove(socket_path)
+        if pool:
+            pool.terminate()
+            log_listener.stop()
+
+
+def request_daemon(request: dict, socket_path: str) -> dict:
+    """Send a request to the daemon, return the response.
+
+    Return None if the daemon is not running, so the caller can do the
+    work itself instead. A version request goes first, and the request is
+    only sent if it is answered within DAEMON_TIMEOUT. Then the daemon is
+    waited for as long as the run takes, so no run is done twice.
+    """
+    if not os.path.exists(socket_path):
+        return None
+    import json
+    import socket
+
+    def ask(stream, request: dict) -> dict:
+        stream.write(json.dumps(dict(
+            request, version=__version__)).encode("utf-8") + b"\n")
+        stream.flush()
+        response = stream.readline()
+        return json.loads(response) if response else None
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(DAEMON_TIMEOUT)
+            client.connect(socket_path)
+            with client.makefile("rwb") as stream:
+                response = ask(stream, {})
+                if response and request:
+                    client.settimeout(None)  # Accepted, wait for the run.
+                    response = ask(stream, request)
+    except socket.timeout:  # Busy with another client, or stuck.
+        log.warning("Daemon on %s did not answer in time.", socket_path)
+        return None
+    except (OSError, AttributeError):  # Not running, or no AF_UNIX.
+        return None
+    return response
+
+
+def forward_to_daemon() -> tuple:
+    """Run args on the daemon, return like process_target, None if cant.
+
+    Runs that need this process, like --watch, --profile and --stats, and
+    runs the daemon cant serve, are not forwarded.
+    """
+    if args.no_daemon or args.watch or args.profile or args.stats or (
+            args.stats_json):
+        return None
+    response = request_daemon({"args": dict(
+        vars(args), fullpath=os.path.abspath(args.fullpath),
+        cache_file=os.path.abspath(args.cache_file))}, args.socket)
+    if not response or "error" in response:
+        log.debug("Not using the daemon: %s", response and response["error"])
+        return None
+    log.info("Processed by the daemon on %s.", args.socket)
+    results = [tuple(result) for result in response["results"]]
+    for file_path, _, error, _ in results:
+        if error:
+            log.error("Error processing %s: %s", file_path, error)
+    return response["files"], results
+
+
+##############################################################################
+# StdIn to StdOut, for build tools that pipe their documents
+
+
+def prettify_stdin():
+    """Prettify StdIn to StdOut as --type, CSS by chunks if not --justify.
+
+    CSS by chunks is like a file run with --stream, a @charset after the
+    first block is not seen, so @charset utf-8 is added before it then.
+    """
+    stdin = TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig")
+    if args.type == "css" and not args.justify:
+        pretty = css_prettify_stream(
+            iter(partial(stdin.read, CSS_STREAM_CHUNK_SIZE), ""),
+            False, args.extraline, args.group)
+        if args.timestamp:
+            pretty = itertools.chain((_css_timestamp(), ), pretty)
+    else:  # Named like a file of --type, to prettify it like one.
+        pretty = (prettify_text(f"<stdin>.{args.type}", stdin.read()), )
+    for text in pretty:
+        sys.stdout.buffer.write(text.encode("utf-8"))
+    sys.stdout.buffer.flush()
+
+
+def serve_batch():
+    """Serve content requests from StdIn on StdOut, until StdIn ends.
+
+    Requests and responses are JSON, one by line, like serve_content, so
+    many documents are prettified over one pipe by one process, --type
+    and the output options of the command line are their defaults.
+    """
+    import json
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+        try:
+            response = serve_content(json.loads(line), args, args.type)
+        except Exception as error:  # Report it, keep serving the next ones.
+            response = {"error": f"{error!r}"}
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
 def main():
     """Main Loop."""
     make_arguments_parser()
-    global log
-    print(__doc__ + __version__)
-    if args.before and getoutput:
-        print(getoutput(str(args.before)))
-    if os.path.isfile(args.fullpath) and args.fullpath.endswith(
-            (".css", ".scss")):  # Work based on if argument is file or folder.
-        print("Target is a CSS / SCSS File.")
-        list_of_files = str(args.fullpath)
-        process_single_css_file(args.fullpath)
-    elif os.path.isfile(args.fullpath
-                        ) and args.fullpath.endswith((".htm", ".html")):
-        print("Target is a HTML File.")
-        list_of_files = str(args.fullpath)
-        process_single_html_file(args.fullpath)
-    elif os.path.isdir(args.fullpath):
-        print("Target is a Folder with CSS / SCSS, HTML, JS.")
-        print("Processing a whole Folder may take some time...")
-        list_of_files = walk2list(
-            args.fullpath, (".css", ".scss", ".html", ".htm"), ".min.css")
-        pool = Pool(cpu_count())  # Multiprocessing Async
-        pool.map_async(process_multiple_files, list_of_files)
-        pool.close()
-        pool.join()
+    make_logger()
+    log.info("%s%s", __doc__, __version__)
+    if args.beautifulsoup and not beautifulsoup():
+        log.warning("BeautifulSoup4 Not Found, use: pip install "
+                    "BeautifulSoup4, only XHTML can be processed.")
+    if args.daemon:
+        use_options(args)
+        return serve_daemon(args.socket)
+    if args.batch:
+        return serve_batch()
+    if args.fullpath == "-":
+        return prettify_stdin()
+    if args.before:
+        from subprocess import getoutput
+        log.info(getoutput(str(args.before)))
+    found = forward_to_daemon()
+    if not found:
+        use_options(args)
+        if args.stats or args.stats_json:
+            enable_stats()
+        profile = None
+        if args.profile:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        found = process_target()
+        if profile:
+            profile.disable()
+            import pstats
+            profile_stats = StringIO()
+            pstats.Stats(profile, stream=profile_stats).sort_stats(
+                "cumulative").print_stats(25)
+            log.info(profile_stats.getvalue())
+    if not found:
+        log.error("File or folder not found,or cant be read,or I/O Error.")
+        sys.exit(1)
+    list_of_files, results = found
+    if args.after:
+        from subprocess import getoutput
+        log.info(getoutput(str(args.after)))
+    errors = [file_path for file_path, _, error, _ in results if error]
+    statuses = Counter(result for _, result, error, _ in results
+                       if not error)
+    if args.stats or args.stats_json:
+        files = {file_path: stats for file_path, _, _, stats in results}
+        total = {}
+        for stats in files.values():
+            merge_stats(total, stats)
+        if args.stats:
+            log.info(stats_table(total))
+            log.info("Total time: %s.", datetime.now() - start_time)
+        if args.stats_json:
+            import json
+            with open(args.stats_json, "w", encoding="utf-8") as json_file:
+                json.dump(stats_json(total, files), json_file, indent=2)
+    changed = sorted(file_path for file_path, result, _, _ in results
+                     if result == "changed")
+    for file_path in changed:
+        log.error("Not prettified: %s", file_path)
+        if args.diff:
+            sys.stdout.write(file_diff(file_path))
+    if args.check:
+        log.info("Files not prettified: %s, already prettified: %s.",
+                 len(changed), statuses["skipped"] + statuses["cached"])
     else:
-        print("File or folder not found,or cant be read,or I/O Error.")
+        log.info("Files written: %s, skipped as identical: %s.",
+                 statuses["written"], statuses["skipped"])
+    if not args.no_cache and not args.stream:
+        if result_cache:
+            result_cache.evict()
+        log.info("Cache hits: %s, misses: %s.", statuses["cached"],
+                 statuses["written"] + statuses["skipped"] +
+                 statuses["changed"])
+    log.info("\n %s \n Files Processed: %s.", "-" * 80, list_of_files)
+    log.info("Number of Files Processed:\n          %s, with errors: %s.",
+             len(results), len(errors))
+    if errors or changed:
         sys.exit(1)
-    if args.after and getoutput:
-        print(getoutput(str(args.after)))
-    print(f'\n {"-" * 80} \n Files Processed: {list_of_files}.')
-    print(f'''Number of Files Processed:
-          {len(list_of_files) if isinstance(list_of_files, tuple) else 1}''')
 
 
 if __name__ in '__main__':
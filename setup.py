@@ -26,7 +26,12 @@
 # python3 setup.py bdist_egg sdist --formats=zip upload --sign
 
 
+import os
+import py_compile
+import shutil
+
 from setuptools import setup, Command
+from tempfile import TemporaryDirectory
 from zipapp import create_archive
 
 
@@ -38,8 +43,19 @@ class ZipApp(Command):
     def finalize_options(self): pass  # Dont needed, but required.
 
     def run(self):
-        return create_archive("css-html-prettify.py", "css-html-prettify.pyz",
-                              "/usr/bin/env python3")
+        """Zip the script as __main__.py, with its bytecode precompiled.
+
+        Running the .py compiles it on every start, the .pyz starts faster
+        using its __main__.pyc, other Python versions use the __main__.py.
+        """
+        with TemporaryDirectory() as folder:
+            main = os.path.join(folder, "__main__.py")
+            shutil.copy("css-html-prettify.py", main)
+            modes = getattr(py_compile, "PycInvalidationMode", None)  # 3.7+
+            py_compile.compile(main, main + "c", doraise=True, **(
+                {"invalidation_mode": modes.UNCHECKED_HASH} if modes else {}))
+            create_archive(folder, "css-html-prettify.pyz",
+                           "/usr/bin/env python3")
 
 
 setup(